@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.endpoints import users, events, progress, photos, articles
+from app.api.endpoints import users, events, progress, photos, articles, jobs
 
 api_router = APIRouter()
 
@@ -8,4 +8,5 @@ api_router.include_router(users.router, prefix="/users", tags=["users"])
 api_router.include_router(events.router, prefix="/events", tags=["events"])
 api_router.include_router(progress.router, prefix="/progress", tags=["progress"])
 api_router.include_router(photos.router, prefix="/photos", tags=["photos"])
-api_router.include_router(articles.router, prefix="/articles", tags=["articles"]) 
\ No newline at end of file
+api_router.include_router(articles.router, prefix="/articles", tags=["articles"])
+api_router.include_router(jobs.router, prefix="/jobs", tags=["jobs"]) 
\ No newline at end of file
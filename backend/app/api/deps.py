@@ -0,0 +1,23 @@
+from fastapi import Depends, HTTPException, Request
+from app.core.firebase_auth import get_current_user
+from app.models.user import User
+from app.services.user_service import UserService
+
+async def get_current_db_user(
+    request: Request,
+    current_user: dict = Depends(get_current_user)
+) -> User:
+    """
+    Resolve the authenticated user's database record.
+    The record is looked up at most once per request and kept on `request.state`.
+    """
+    db_user = getattr(request.state, "db_user", None)
+    if db_user is not None and db_user.firebase_uid == current_user["uid"]:
+        return db_user
+    
+    db_user = await UserService.get_user_by_firebase_uid(current_user["uid"])
+    if not db_user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    request.state.db_user = db_user
+    return db_user
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, Depends, Body, Query, status
+from fastapi import APIRouter, HTTPException, Depends, Body, Query, Response, status
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel, Field
 from datetime import datetime
@@ -7,6 +7,7 @@ from pymongo.collection import Collection
 
 from app.db.mongodb import get_database
 from app.core.firebase_auth import get_current_user
+from app.core.pagination import NEXT_CURSOR_HEADER, keyset_filter, next_cursor, sort_spec
 
 router = APIRouter()
 
@@ -68,16 +69,28 @@ def serialize_article(article):
 
 @router.get("/", response_model=List[Article])
 async def get_articles(
+    response: Response,
     category: Optional[str] = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
     db = Depends(get_database)
 ):
     query = {}
     if category:
         query["category"] = category
+    if cursor:
+        query.update(keyset_filter(cursor, "created_at", -1))
     
     articles_collection: Collection = db.articles
-    cursor = articles_collection.find(query).sort("created_at", -1)
-    articles = await cursor.to_list(length=100)  # Limit to 100 articles for performance
+    results = articles_collection.find(query).sort(sort_spec("created_at", -1))
+    if skip and not cursor:
+        results = results.skip(skip)
+    articles = await results.limit(limit).to_list(length=limit)
+    
+    page_cursor = next_cursor(articles, limit, "created_at")
+    if page_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = page_cursor
     return [serialize_article(article) for article in articles]
 
 @router.get("/{article_id}", response_model=Article)
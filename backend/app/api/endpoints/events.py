@@ -1,9 +1,12 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from app.core.firebase_auth import get_current_user, get_admin_user, get_optional_user
-from app.models.event import Event, EventCreate, EventUpdate
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from app.api.deps import get_current_db_user
+from app.core.pagination import NEXT_CURSOR_HEADER
+from app.core.firebase_auth import get_admin_user, get_optional_user
+from app.models.event import Event, EventCreate, EventUpdate, EVENT_VIEW_ADAPTERS
+from app.models.user import User
 from app.services.event_service import EventService
-from app.services.user_service import UserService
+from app.services.registration_service import RegistrationService
 from bson import ObjectId
 import logging
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
@@ -16,11 +19,33 @@ logger = logging.getLogger(__name__)
 async def get_events(
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    view: str = Query("full", description="full, or summary for listings without the description"),
+    fields: Optional[str] = Query(None, description="Comma-separated event fields to return instead of a view"),
     user = Depends(get_optional_user)
 ):
-    """Get all events. This endpoint is public and doesn't require authentication."""
+    """
+    Get all events. This endpoint is public and doesn't require authentication.
+    The cursor for the next page is returned in the X-Next-Cursor header.
+    `view=summary` or `fields=` return partial events; the response model
+    documents the full view.
+    """
     try:
-        return await EventService.get_events(skip, limit)
+        field_list = [field.strip() for field in fields.split(",") if field.strip()] if fields else None
+        events, page_cursor = await EventService.get_events(skip, limit, cursor, view, field_list)
+        if user:
+            await RegistrationService.mark_registered(events, user["uid"])
+        
+        # Serialize with the view's own model instead of validating against Event
+        adapter = EVENT_VIEW_ADAPTERS["fields" if field_list else view]
+        headers = {NEXT_CURSOR_HEADER: page_cursor} if page_cursor else None
+        return Response(
+            content=adapter.dump_json(events, by_alias=True),
+            media_type="application/json",
+            headers=headers
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching events: {str(e)}")
         raise HTTPException(
@@ -52,6 +77,8 @@ async def get_event(event_id: str, user = Depends(get_optional_user)):
         if not event:
             raise HTTPException(status_code=404, detail="Event not found")
         
+        if user:
+            await RegistrationService.mark_registered([event], user["uid"])
         return event
     except HTTPException:
         raise
@@ -99,22 +126,10 @@ async def delete_event(event_id: str, user = Depends(get_admin_user)):
         )
 
 @router.post("/{event_id}/register", status_code=status.HTTP_200_OK)
-async def register_for_event(event_id: str, user = Depends(get_current_user)):
+async def register_for_event(event_id: str, db_user: User = Depends(get_current_db_user)):
     """Register the current user for an event."""
     try:
-        # Get the user from the database
-        db_user = await UserService.get_user_by_firebase_uid(user["uid"])
-        if not db_user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        updated_event = await EventService.register_participant(event_id, str(db_user.id))
-        if not updated_event:
-            raise HTTPException(status_code=404, detail="Event not found")
-        
-        # Also update the user's registered events
-        await UserService.add_event_to_user(str(db_user.id), event_id)
-        
-        return {"message": "Successfully registered for event"}
+        return await RegistrationService.register(event_id, db_user)
     except HTTPException:
         raise
     except Exception as e:
@@ -125,22 +140,10 @@ async def register_for_event(event_id: str, user = Depends(get_current_user)):
         )
 
 @router.post("/{event_id}/unregister", status_code=status.HTTP_200_OK)
-async def unregister_from_event(event_id: str, user = Depends(get_current_user)):
+async def unregister_from_event(event_id: str, db_user: User = Depends(get_current_db_user)):
     """Unregister the current user from an event."""
     try:
-        # Get the user from the database
-        db_user = await UserService.get_user_by_firebase_uid(user["uid"])
-        if not db_user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        updated_event = await EventService.unregister_participant(event_id, str(db_user.id))
-        if not updated_event:
-            raise HTTPException(status_code=404, detail="Event not found")
-        
-        # Also update the user's registered events
-        await UserService.remove_event_from_user(str(db_user.id), event_id)
-        
-        return {"message": "Successfully unregistered from event"}
+        return await RegistrationService.unregister(event_id, db_user)
     except HTTPException:
         raise
     except Exception as e:
@@ -152,14 +155,9 @@ async def unregister_from_event(event_id: str, user = Depends(get_current_user))
 
 @router.get("/user/registered", response_model=List[Event])
 async def get_user_registered_events(
-    current_user: dict = Depends(get_current_user)
+    user: User = Depends(get_current_db_user)
 ):
     """
     Get all events the current user is registered for.
     """
-    # Get the user from the database
-    user = await UserService.get_user_by_firebase_uid(current_user["uid"])
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    return await EventService.get_user_events(str(user.id)) 
\ No newline at end of file
+    return await RegistrationService.get_user_events(str(user.id)) 
\ No newline at end of file
@@ -0,0 +1,24 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from app.core.firebase_auth import get_current_user
+from app.core.jobs import job_queue
+from app.models.job import Job
+
+router = APIRouter()
+
+@router.get("/{job_id}", response_model=Job)
+async def get_job(
+    job_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Get the status of a background job.
+    Only the user who started the job, or an admin, can see it.
+    """
+    job = await job_queue.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    
+    if job.get("created_by") != current_user["uid"] and not current_user.get("is_admin", False):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to access this job")
+    
+    return job
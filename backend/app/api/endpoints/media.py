@@ -0,0 +1,96 @@
+import mimetypes
+import os
+import re
+from email.utils import formatdate
+from typing import Dict
+import anyio
+from fastapi import APIRouter, HTTPException, Request, Response, status
+from fastapi.responses import RedirectResponse
+from app.core.config import settings
+from app.core.media import MediaFileResponse, parse_range
+from app.core.storage import LocalStorageBackend, storage_backend
+
+router = APIRouter()
+
+# Content-addressed originals and variants never change once written
+CONTENT_ADDRESSED_NAME = re.compile(r"^(variants/)?[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(-\d+)?\.[A-Za-z0-9]+$")
+
+def _matches_etag(header: str, etag: str) -> bool:
+    candidates = [candidate.strip() for candidate in header.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+@router.api_route(
+    f"{settings.STORAGE_LOCAL_URL_PREFIX}/{{name:path}}",
+    methods=["GET", "HEAD"],
+    include_in_schema=False
+)
+async def get_media(name: str, request: Request):
+    """
+    Serve a stored photo or variant.
+    Content-addressed files get a year-long immutable Cache-Control and an
+    ETag derived from their hash; conditional and byte-range requests are
+    answered without touching the file contents.
+    """
+    if not isinstance(storage_backend, LocalStorageBackend):
+        # Objects live in an object store; send clients there
+        return RedirectResponse(storage_backend.url(name, str(request.base_url)), status_code=307)
+    
+    path = storage_backend.local_path(name)
+    if path is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+    try:
+        stat = await anyio.to_thread.run_sync(os.stat, path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+    
+    if CONTENT_ADDRESSED_NAME.match(name):
+        etag = f'"{os.path.basename(name)}"'
+        cache_control = f"public, max-age={settings.MEDIA_IMMUTABLE_MAX_AGE}, immutable"
+    else:
+        # Files from before content addressing may be replaced in place
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        cache_control = f"public, max-age={settings.MEDIA_CACHE_MAX_AGE}"
+    
+    headers: Dict[str, str] = {
+        "ETag": etag,
+        "Cache-Control": cache_control,
+        "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+        "Accept-Ranges": "bytes",
+    }
+    media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _matches_etag(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    if settings.MEDIA_ACCEL_REDIRECT_PREFIX:
+        # Let the front proxy (nginx X-Accel-Redirect) send the bytes
+        headers["X-Accel-Redirect"] = f"{settings.MEDIA_ACCEL_REDIRECT_PREFIX.rstrip('/')}/{name}"
+        return Response(headers=headers, media_type=media_type)
+    
+    size = stat.st_size
+    send_body = request.method != "HEAD"
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range.strip() == etag):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            return Response(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                headers={**headers, "Content-Range": f"bytes */{size}"}
+            )
+        if byte_range:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            return MediaFileResponse(
+                path, start, end - start + 1,
+                status_code=status.HTTP_206_PARTIAL_CONTENT,
+                headers=headers,
+                media_type=media_type,
+                send_body=send_body
+            )
+    
+    return MediaFileResponse(path, 0, size, headers=headers, media_type=media_type, send_body=send_body)
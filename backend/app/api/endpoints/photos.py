@@ -1,29 +1,35 @@
-from typing import List, Optional, Dict
-from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File, Form, Request
+from typing import List, Optional, Dict, Union
+from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File, Form, Request, Response
 from fastapi.responses import JSONResponse
 import logging
 from app.core.firebase_auth import get_current_user, get_admin_user, get_optional_user
-from app.models.photo import Photo, PhotoCreate, PhotoUpdate
-from app.services.photo_service import PhotoService
+from app.models.photo import Photo, PhotoCreate, PhotoUpdate, PhotoGalleryItem
+from app.core.jobs import job_queue
+from app.services.photo_service import PhotoService, PHOTO_PROCESS_JOB
+from app.services.photo_storage import PhotoStorage
 from app.services.user_service import UserService
-import aiofiles
 import os
 from datetime import datetime
-import uuid
 from app.core.config import settings
-from PIL import Image as PILImage
-import io
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-UPLOAD_DIR = "uploads/photos"
-# Ensure upload directory exists
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+# Ensure the upload staging directory exists
+os.makedirs(PhotoStorage.temp_dir, exist_ok=True)
+
+def _with_absolute_urls(photo: Union[Photo, PhotoGalleryItem], base_url: str) -> Union[Photo, PhotoGalleryItem]:
+    """Set the full photo, thumbnail and variant URLs the frontend expects, for the storage backend in use."""
+    photo.photo_url = PhotoStorage.public_url(photo.image_url, base_url)
+    photo.thumbnail_url = PhotoStorage.public_url(photo.thumbnail_url, base_url) or photo.photo_url
+    for variant in photo.variants:
+        variant.url = PhotoStorage.public_url(variant.url, base_url)
+    return photo
 
 @router.post("/", response_model=Photo)
 async def create_photo(
     request: Request,
+    response: Response,
     title: str = Form(...),
     description: Optional[str] = Form(None),
     photo_date: Optional[str] = Form(None),
@@ -32,6 +38,9 @@ async def create_photo(
 ):
     """
     Create a new photo.
+    New images are stored right away and answered with 202 and status
+    "processing"; variants are generated in the background. Poll the
+    returned job_id at /jobs/{job_id}, or the photo itself.
     """
     try:
         # For testing, use a default user if no authenticated user
@@ -47,79 +56,86 @@ async def create_photo(
             is_admin = current_user.get("is_admin", False)
             logger.info(f"User attempting to upload photo: {current_user.get('uid')} - Admin: {is_admin}")
         
-        # Validate file type
-        if not photo.content_type.startswith("image/"):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="File must be an image",
-            )
-        
-        # Generate unique filename
-        file_ext = os.path.splitext(photo.filename)[1]
-        unique_filename = f"{uuid.uuid4()}{file_ext}"
-        file_path = os.path.join(UPLOAD_DIR, unique_filename)
-        
-        # Save the file
-        # Create directory if it doesn't exist
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        
-        # Read the file content
-        content = await photo.read()
-        
-        # Save original image
-        async with aiofiles.open(file_path, "wb") as out_file:
-            await out_file.write(content)
-        
-        # Generate public URL for the file
-        public_url = f"/uploads/photos/{unique_filename}"
-        
-        # Parse date if provided
-        parsed_date = None
-        if photo_date:
-            try:
-                parsed_date = datetime.fromisoformat(photo_date)
-            except ValueError:
+        # Stream the upload to a temp file; the type is sniffed from its content
+        stored = await PhotoStorage.receive(photo)
+        existing_photo = None
+        created_photo = None
+        media = {}
+        try:
+            existing_photo = await PhotoService.get_photo_by_content_key(stored["key"])
+            if existing_photo:
+                # Same bytes as an earlier upload: link to its files and variants
+                logger.info(f"Upload matches stored content {stored['key']}, reusing it")
+                media = {
+                    "width": existing_photo.width,
+                    "height": existing_photo.height,
+                    "dominant_color": existing_photo.dominant_color,
+                    "placeholder": existing_photo.placeholder,
+                    "thumbnail_url": existing_photo.thumbnail_url,
+                    "variants": existing_photo.variants
+                }
+            else:
+                # Variants are generated by a background job once the photo is saved
+                media = {"status": "processing"}
+            await PhotoStorage.commit(stored)
+            
+            # Parse date if provided
+            parsed_date = None
+            if photo_date:
+                try:
+                    parsed_date = datetime.fromisoformat(photo_date)
+                except ValueError:
+                    parsed_date = datetime.utcnow()
+            else:
                 parsed_date = datetime.utcnow()
-        else:
-            parsed_date = datetime.utcnow()
+                
+            # Create photo object
+            photo_data = PhotoCreate(
+                title=title,
+                description=description,
+                image_url=stored["url"],
+                photo_date=parsed_date,
+                created_by=current_user["uid"],
+                content_key=stored["key"],
+                content_type=stored["content_type"],
+                size=stored["size"],
+                **media
+            )
             
-        # Create photo object
-        photo_data = PhotoCreate(
-            title=title,
-            description=description,
-            image_url=public_url,
-            photo_date=parsed_date,
-            created_by=current_user["uid"]
-        )
-        
-        # Save to database
-        created_photo = await PhotoService.create_photo(photo_data)
+            # Save to database
+            created_photo = await PhotoService.create_photo(photo_data)
+            if created_photo.status == "processing":
+                job = await job_queue.enqueue(
+                    PHOTO_PROCESS_JOB,
+                    {"photo_id": created_photo.id},
+                    created_by=current_user["uid"]
+                )
+                created_photo.job_id = str(job["_id"])
+                response.status_code = status.HTTP_202_ACCEPTED
+        except Exception:
+            if created_photo:
+                # Never processed, so it has no variants yet
+                await PhotoService.delete_photo(created_photo.id)
+            # Drop newly stored files unless another photo has linked to them since
+            if not existing_photo:
+                await PhotoService.release_content(
+                    stored["key"],
+                    [stored["url"], *(variant.url for variant in media.get("variants", []))]
+                )
+            raise
+        finally:
+            await PhotoStorage.finalize(stored)
         
         # Add additional fields for the response
-        base_url = str(request.base_url).rstrip("/")
-        full_url = f"{base_url}{public_url}"
-        
-        # Ensure photo_url and thumbnail_url are set
-        if not hasattr(created_photo, 'photo_url') or not created_photo.photo_url:
-            created_photo.photo_url = full_url
-            
-        if not hasattr(created_photo, 'thumbnail_url') or not created_photo.thumbnail_url:
-            created_photo.thumbnail_url = full_url
+        _with_absolute_urls(created_photo, str(request.base_url))
         
         logger.info(f"Successfully created photo with ID: {created_photo.id}")
         return created_photo
             
     except Exception as e:
         logger.error(f"Error saving photo: {str(e)}")
-        # Check if file was saved but database failed
-        if 'file_path' in locals() and os.path.exists(file_path):
-            try:
-                # If file was saved but database operation failed, delete the file
-                os.remove(file_path)
-                logger.info(f"Cleaned up file after error: {file_path}")
-            except Exception as cleanup_err:
-                logger.error(f"Failed to clean up file after error: {str(cleanup_err)}")
-                
+        if isinstance(e, HTTPException):
+            raise e
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to save photo: {str(e)}",
@@ -130,30 +146,50 @@ async def get_photos(
     request: Request,
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
-    sort_by: str = Query("-created_at", description="Sort field, prefix with - for descending: -created_at, photo_date, title")
+    sort_by: str = Query("-created_at", description="Sort field, prefix with - for descending: -created_at, photo_date, title"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page; skip is ignored when set"),
+    include_total: bool = Query(True, description="Set to false to skip counting, e.g. for infinite scroll; total is then null")
 ):
     """
     Get a list of photos with pagination.
     """
-    photos = await PhotoService.get_photos(skip, limit, sort_by)
-    total = await PhotoService.count_photos()
+    photos, page_cursor = await PhotoService.get_photos(skip, limit, sort_by, cursor)
+    total = await PhotoService.count_photos() if include_total else None
     
     # Map image URLs to include backend URL if needed
     base_url = str(request.base_url)
     for photo in photos:
-        # Make sure we have the full URL for images
-        if not photo.image_url.startswith(("http://", "https://")):
-            # Add base URL for relative paths
-            photo_url = f"{base_url}{photo.image_url.lstrip('/')}"
-            # Set the photo_url and thumbnail_url fields that frontend expects
-            photo.photo_url = photo_url
-            photo.thumbnail_url = photo_url
+        _with_absolute_urls(photo, base_url)
     
     return {
         "items": photos,
         "total": total,
         "limit": limit,
-        "skip": skip
+        "skip": skip,
+        "next_cursor": page_cursor
+    }
+
+@router.get("/gallery", response_model=Dict)
+async def get_gallery(
+    request: Request,
+    limit: int = Query(24, ge=1, le=100),
+    sort_by: str = Query("-created_at", description="Sort field, prefix with - for descending: -created_at, photo_date, title"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page")
+):
+    """
+    Get a page of the photo gallery.
+    Each item carries the dimensions, dominant colour and inline placeholder,
+    so the grid can be laid out and painted before any image is downloaded.
+    """
+    items, page_cursor = await PhotoService.get_gallery(limit, sort_by, cursor)
+    
+    base_url = str(request.base_url)
+    for item in items:
+        _with_absolute_urls(item, base_url)
+    
+    return {
+        "items": items,
+        "next_cursor": page_cursor
     }
 
 @router.get("/count")
@@ -180,12 +216,7 @@ async def get_photo(
         )
         
     # Add the full URL for the image
-    if not photo.image_url.startswith(("http://", "https://")):
-        base_url = str(request.base_url)
-        photo.photo_url = f"{base_url}{photo.image_url.lstrip('/')}"
-        photo.thumbnail_url = photo.photo_url
-        
-    return photo
+    return _with_absolute_urls(photo, str(request.base_url))
 
 @router.put("/{photo_id}", response_model=Photo)
 async def update_photo(
@@ -233,9 +264,6 @@ async def delete_photo(
             )
         
         logger.info(f"Found photo to delete: {photo}")
-        # Store image_url before deleting from database
-        image_url = photo.image_url
-        logger.info(f"Photo image_url: {image_url}")
         
         # Delete from database
         success = await PhotoService.delete_photo(photo_id)
@@ -246,51 +274,9 @@ async def delete_photo(
                 detail="Photo not found or could not be deleted from database",
             )
         
-        # Delete the actual file
+        # Delete the files, once no other photo shares them
         try:
-            # Extract file path
-            if not image_url:
-                logger.warning("No image URL found for photo")
-                return JSONResponse(content={"detail": "Photo deleted from database but no image URL found"})
-            
-            # Try multiple path variations to handle different URL formats
-            possible_paths = []
-            
-            # Handle full URLs with domain
-            if "://" in image_url:
-                from urllib.parse import urlparse
-                parsed_url = urlparse(image_url)
-                path = parsed_url.path
-                if path.startswith('/'):
-                    path = path[1:]  # Remove leading slash
-                possible_paths.append(path)
-                
-            # Handle paths with or without leading slash
-            if image_url.startswith('/'):
-                possible_paths.append(image_url[1:])  # Without leading slash
-            else:
-                possible_paths.append(image_url)
-                possible_paths.append(f"/{image_url}")  # With leading slash
-                
-            # Try relative to uploads dir
-            if "uploads/photos" in image_url:
-                filename = os.path.basename(image_url)
-                possible_paths.append(f"uploads/photos/{filename}")
-                
-            # Attempt to delete using all possible paths
-            deleted = False
-            for path in possible_paths:
-                logger.info(f"Attempting to delete file: {path}")
-                if os.path.exists(path):
-                    os.remove(path)
-                    logger.info(f"Successfully deleted file: {path}")
-                    deleted = True
-                    break
-                    
-            if not deleted:
-                paths_str = ", ".join(possible_paths)
-                logger.warning(f"File not found for deletion. Tried paths: {paths_str}")
-                
+            await PhotoService.release_files(photo)
         except Exception as e:
             logger.error(f"Error deleting photo file: {str(e)}")
             # We don't want to fail the request if DB deletion was successful
@@ -1,49 +1,69 @@
-from typing import List, Dict, Any
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from typing import List, Dict, Any, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Header
+from fastapi.responses import StreamingResponse
+from app.api.deps import get_current_db_user
 from app.core.firebase_auth import get_current_user, get_admin_user
-from app.models.progress import Progress, ProgressCreate, ProgressUpdate
+from app.models.progress import (
+    Progress, ProgressCreate, ProgressUpdate, ProgressBulkCreate, ProgressBulkResult, ProgressSummary
+)
+from app.models.user import User
 from app.services.progress_service import ProgressService
-from app.services.user_service import UserService
 
 router = APIRouter()
 
 @router.post("/", response_model=Progress, status_code=status.HTTP_201_CREATED)
 async def create_progress(
     progress: ProgressCreate,
-    current_user: dict = Depends(get_current_user)
+    user: User = Depends(get_current_db_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255)
 ):
     """
     Create a new progress entry.
+    Send an `Idempotency-Key` header to make retries safe: a repeated request
+    with the same key returns the entry created by the first one.
     """
-    # Get the user from the database
-    user = await UserService.get_user_by_firebase_uid(current_user["uid"])
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
     # Set the user ID - always override with the authenticated user's ID
     progress.user_id = str(user.id)
     
-    return await ProgressService.create_progress(progress)
+    return await ProgressService.create_progress(progress, user, idempotency_key)
+
+@router.post("/bulk", response_model=ProgressBulkResult)
+async def create_progress_bulk(
+    bulk: ProgressBulkCreate,
+    user: User = Depends(get_current_db_user)
+):
+    """
+    Create several progress entries at once, e.g. when a device syncs its backlog.
+    Entries are always recorded for the authenticated user; the response has a
+    result per entry, in request order.
+    """
+    return await ProgressService.create_progress_bulk(bulk.entries, user)
 
 @router.get("/", response_model=List[Progress])
 async def get_user_progress(
     event_id: str = None,
-    current_user: dict = Depends(get_current_user)
+    user: User = Depends(get_current_db_user)
 ):
     """
     Get all progress entries for the current user, optionally filtered by event.
     """
-    # Get the user from the database
-    user = await UserService.get_user_by_firebase_uid(current_user["uid"])
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
     return await ProgressService.get_user_progress(str(user.id), event_id)
 
+@router.get("/summary", response_model=List[ProgressSummary])
+async def get_progress_summary(
+    event_id: Optional[str] = None,
+    user: User = Depends(get_current_db_user)
+):
+    """
+    Get the current user's progress totals per event, optionally for one event.
+    """
+    return await ProgressService.get_progress_summary(str(user.id), event_id)
+
 @router.get("/{progress_id}", response_model=Progress)
 async def get_progress(
     progress_id: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    user: User = Depends(get_current_db_user)
 ):
     """
     Get a progress entry by ID.
@@ -52,11 +72,6 @@ async def get_progress(
     if not progress:
         raise HTTPException(status_code=404, detail="Progress entry not found")
     
-    # Get the user from the database
-    user = await UserService.get_user_by_firebase_uid(current_user["uid"])
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
     # Check if the progress entry belongs to the current user or if the user is an admin
     if str(progress.user_id) != str(user.id) and not current_user.get("is_admin", False):
         raise HTTPException(status_code=403, detail="Not authorized to access this progress entry")
@@ -67,7 +82,8 @@ async def get_progress(
 async def update_progress(
     progress_id: str,
     progress_update: ProgressUpdate,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    user: User = Depends(get_current_db_user)
 ):
     """
     Update a progress entry.
@@ -77,11 +93,6 @@ async def update_progress(
     if not progress:
         raise HTTPException(status_code=404, detail="Progress entry not found")
     
-    # Get the user from the database
-    user = await UserService.get_user_by_firebase_uid(current_user["uid"])
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
     # Check if the progress entry belongs to the current user or if the user is an admin
     if str(progress.user_id) != str(user.id) and not current_user.get("is_admin", False):
         raise HTTPException(status_code=403, detail="Not authorized to update this progress entry")
@@ -95,7 +106,8 @@ async def update_progress(
 @router.delete("/{progress_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_progress(
     progress_id: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    user: User = Depends(get_current_db_user)
 ):
     """
     Delete a progress entry.
@@ -105,11 +117,6 @@ async def delete_progress(
     if not progress:
         raise HTTPException(status_code=404, detail="Progress entry not found")
     
-    # Get the user from the database
-    user = await UserService.get_user_by_firebase_uid(current_user["uid"])
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
     # Check if the progress entry belongs to the current user or if the user is an admin
     if str(progress.user_id) != str(user.id) and not current_user.get("is_admin", False):
         raise HTTPException(status_code=403, detail="Not authorized to delete this progress entry")
@@ -120,22 +127,76 @@ async def delete_progress(
     
     return {"detail": "Progress entry deleted successfully"}
 
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
 @router.get("/event/{event_id}", response_model=List[Progress])
 async def get_event_progress(
+    request: Request,
     event_id: str,
+    format: Optional[str] = Query(None, pattern="^(json|ndjson|csv)$", description="json, or ndjson/csv to stream an export"),
+    batch_size: int = Query(ProgressService.export_batch_size, ge=1, le=10000, description="Entries read and sent per chunk when streaming"),
     current_user: dict = Depends(get_current_user)
 ):
     """
     Get all progress entries for an event.
+    Pass `format=ndjson`/`format=csv` or `Accept: application/x-ndjson` to stream
+    the entries instead of building the whole list in memory.
     """
+    export_format = format
+    if export_format is None and "application/x-ndjson" in request.headers.get("accept", ""):
+        export_format = "ndjson"
+    
+    if export_format in EXPORT_MEDIA_TYPES:
+        headers = {}
+        if export_format == "csv":
+            headers["Content-Disposition"] = f'attachment; filename="event-{event_id}-progress.csv"'
+        return StreamingResponse(
+            ProgressService.stream_event_progress(event_id, export_format, batch_size),
+            media_type=EXPORT_MEDIA_TYPES[export_format],
+            headers=headers
+        )
+    
     return await ProgressService.get_event_progress(event_id)
 
+@router.get("/event/{event_id}/timeseries", response_model=List[Dict[str, Any]])
+async def get_event_timeseries(
+    event_id: str,
+    bucket: str = Query("day", pattern="^(day|week)$", description="day, or week (starting Monday)"),
+    mine: bool = Query(False, description="Only the current user's progress instead of the whole event"),
+    start: Optional[str] = Query(None, description="First period to include, YYYY-MM-DD"),
+    end: Optional[str] = Query(None, description="Last period to include, YYYY-MM-DD"),
+    user: User = Depends(get_current_db_user)
+):
+    """
+    Get an event's total distance, time and entries per day or week, for charts.
+    """
+    return await ProgressService.get_event_timeseries(
+        event_id, bucket, str(user.id) if mine else None, start, end
+    )
+
 @router.get("/event/{event_id}/leaderboard", response_model=List[Dict[str, Any]])
 async def get_event_leaderboard(
     event_id: str,
+    limit: int = Query(0, ge=0, le=1000, description="Number of entries to return, 0 for the whole leaderboard"),
+    after_user_id: Optional[str] = Query(None, description="user_id of the last entry of the previous page"),
+    after_rank: int = Query(0, ge=0, description="Rank of that entry, to number the page without counting"),
     current_user: dict = Depends(get_current_user)
 ):
     """
-    Get the leaderboard for an event.
+    Get the leaderboard for an event, optionally one page of it.
+    """
+    return await ProgressService.get_leaderboard(event_id, limit, after_rank, after_user_id)
+
+@router.get("/event/{event_id}/leaderboard/me", response_model=Dict[str, Any])
+async def get_my_leaderboard_position(
+    event_id: str,
+    neighbours: int = Query(5, ge=0, le=50, description="Entries to include above and below the current user"),
+    user: User = Depends(get_current_db_user)
+):
+    """
+    Get the current user's rank in an event's leaderboard and the entries around it.
     """
-    return await ProgressService.get_leaderboard(event_id) 
\ No newline at end of file
+    return await ProgressService.get_user_leaderboard_position(event_id, str(user.id), neighbours) 
\ No newline at end of file
@@ -1,5 +1,7 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from app.api.deps import get_current_db_user
+from app.core.pagination import NEXT_CURSOR_HEADER
 from app.core.firebase_auth import get_current_user, get_admin_user
 from app.models.user import User, UserCreate, UserUpdate
 from app.services.user_service import UserService
@@ -127,16 +129,12 @@ async def get_current_user_info(
 @router.put("/me", response_model=User)
 async def update_current_user(
     user_update: UserUpdate,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    user: User = Depends(get_current_db_user)
 ):
     """
     Update the current user's information.
     """
-    # Get the user from the database
-    user = await UserService.get_user_by_firebase_uid(current_user["uid"])
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
     # Only admins can update admin status
     if user_update.is_admin is not None and not current_user.get("is_admin", False):
         raise HTTPException(
@@ -195,12 +193,18 @@ async def delete_user(
 
 @router.get("/", response_model=List[User])
 async def get_users(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
     current_user: dict = Depends(get_admin_user)
 ):
     """
     Get all users with pagination.
     Only admin users can access the list of users.
+    The cursor for the next page is returned in the X-Next-Cursor header.
     """
-    return await UserService.get_all_users(skip, limit) 
\ No newline at end of file
+    users, page_cursor = await UserService.get_all_users(skip, limit, cursor)
+    if page_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = page_cursor
+    return users 
\ No newline at end of file
@@ -0,0 +1,207 @@
+from typing import Any, Awaitable, Callable, Dict, Optional, Hashable
+from collections import OrderedDict
+from datetime import datetime
+import asyncio
+import json
+import logging
+import time
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class TTLCache:
+    """
+    Small in-process LRU cache whose entries expire after `ttl` seconds.
+    Not shared between worker processes, so keep the TTL short.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 30):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value, or None if missing or expired."""
+        entry = self._data.get(key)
+        if entry is None or entry[1] <= time.monotonic():
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a value, evicting the least recently used entries beyond `max_size`."""
+        self._data[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl))
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._data), "max_size": self.max_size}
+
+class CacheBackend:
+    """Interface for the async stores used by ResponseCache."""
+
+    async def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        raise NotImplementedError
+
+    async def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    async def incr(self, key: str) -> int:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+class MemoryCacheBackend(CacheBackend):
+    """In-process LRU backend. Each worker process has its own copy."""
+
+    def __init__(self, max_size: int = 1024):
+        self._cache = TTLCache(max_size=max_size)
+        # Counters are kept apart so LRU eviction can never reset a namespace version
+        self._counters: Dict[str, int] = {}
+
+    async def get(self, key: str) -> Optional[Any]:
+        if key in self._counters:
+            return self._counters[key]
+        return self._cache.get(key)
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        self._cache.set(key, value, ttl)
+
+    async def delete(self, key: str) -> None:
+        self._cache.delete(key)
+
+    async def incr(self, key: str) -> int:
+        self._counters[key] = self._counters.get(key, 0) + 1
+        return self._counters[key]
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    raise TypeError(f"Cannot cache value of type {type(value).__name__}")
+
+def _json_object_hook(value: Dict[str, Any]) -> Any:
+    if "__datetime__" in value:
+        return datetime.fromisoformat(value["__datetime__"])
+    return value
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Backend for any server speaking the Redis protocol, shared by all workers.
+    Values are stored as JSON. Needs the optional `redis` package.
+    """
+
+    def __init__(self, url: str):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package")
+        self._redis = redis.from_url(url)
+
+    async def get(self, key: str) -> Optional[Any]:
+        raw = await self._redis.get(key)
+        if raw is None:
+            return None
+        return json.loads(raw, object_hook=_json_object_hook)
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        await self._redis.set(key, json.dumps(value, default=_json_default), px=max(int(ttl * 1000), 1))
+
+    async def delete(self, key: str) -> None:
+        await self._redis.delete(key)
+
+    async def incr(self, key: str) -> int:
+        return await self._redis.incr(key)
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+def create_cache_backend() -> CacheBackend:
+    """Build the backend selected by CACHE_BACKEND."""
+    if settings.CACHE_BACKEND == "redis":
+        return RedisCacheBackend(settings.REDIS_URL)
+    return MemoryCacheBackend(max_size=settings.CACHE_MAX_SIZE)
+
+cache_backend = create_cache_backend()
+
+class ResponseCache:
+    """
+    Caches the results of an async loader in a CacheBackend.
+    
+    - Concurrent misses for the same key share one loader call.
+    - Entries are grouped in namespaces; `invalidate(namespace)` bumps the
+      namespace version so every entry in it is skipped from then on.
+    - With `soft_ttl`, entries older than it are still served while a single
+      background refresh runs (stale-while-revalidate), until `ttl` expires.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: float, soft_ttl: Optional[float] = None):
+        self.backend = backend
+        self.ttl = ttl
+        self.soft_ttl = soft_ttl
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self._pending: Dict[str, asyncio.Task] = {}
+
+    async def _versioned_key(self, namespace: str, key: str) -> str:
+        version = await self.backend.get(f"{namespace}:version") or 0
+        return f"{namespace}:v{version}:{key}"
+
+    async def _load(self, cache_key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        value = await loader()
+        fresh_until = time.time() + (self.soft_ttl if self.soft_ttl else self.ttl)
+        await self.backend.set(cache_key, {"value": value, "fresh_until": fresh_until}, self.ttl)
+        return value
+
+    def _load_once(self, cache_key: str, loader: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        task = self._pending.get(cache_key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(cache_key, loader))
+            self._pending[cache_key] = task
+            task.add_done_callback(lambda done: self._finish(cache_key, done))
+        return task
+
+    def _finish(self, cache_key: str, task: asyncio.Task) -> None:
+        self._pending.pop(cache_key, None)
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug(f"Cache load failed for {cache_key}: {task.exception()}")
+
+    async def get_or_load(self, namespace: str, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached value for `key`, calling `loader` to fill it on a miss."""
+        cache_key = await self._versioned_key(namespace, key)
+        entry = await self.backend.get(cache_key)
+        if entry is not None:
+            if entry["fresh_until"] > time.time():
+                self.hits += 1
+            else:
+                # Serve the stale value and refresh it in the background
+                self.stale_hits += 1
+                self._load_once(cache_key, loader)
+            return entry["value"]
+
+        self.misses += 1
+        return await asyncio.shield(self._load_once(cache_key, loader))
+
+    async def invalidate(self, namespace: str) -> None:
+        """Drop every entry in a namespace."""
+        await self.backend.incr(f"{namespace}:version")
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "stale_hits": self.stale_hits, "misses": self.misses}
@@ -1,15 +1,30 @@
 import os
+from dotenv import load_dotenv
 from pydantic_settings import BaseSettings
 
+# Load environment variables from .env before the settings read them
+load_dotenv()
+
 class Settings(BaseSettings):
     """Application settings."""
     API_V1_STR: str = "/api/v1"
     PROJECT_NAME: str = "Run2Rejuvenate API"
     
     # MongoDB settings
-    MONGODB_URI: str = os.getenv("MONGODB_URI", "mongodb://localhost:27017/fitness")
+    # MONGODB_URL is the older name for the connection string and is still honoured
+    MONGODB_URI: str = os.getenv("MONGODB_URI", os.getenv("MONGODB_URL", "mongodb://localhost:27017/"))
     MONGODB_DB_NAME: str = os.getenv("MONGODB_DB_NAME", "fitness_platform")
     
+    # MongoDB connection pool, per worker process
+    MONGODB_MAX_POOL_SIZE: int = int(os.getenv("MONGODB_MAX_POOL_SIZE", "100"))
+    MONGODB_MIN_POOL_SIZE: int = int(os.getenv("MONGODB_MIN_POOL_SIZE", "0"))
+    MONGODB_MAX_IDLE_TIME_MS: int = int(os.getenv("MONGODB_MAX_IDLE_TIME_MS", "60000"))
+    MONGODB_SERVER_SELECTION_TIMEOUT_MS: int = int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+    MONGODB_CONNECT_TIMEOUT_MS: int = int(os.getenv("MONGODB_CONNECT_TIMEOUT_MS", "10000"))
+    MONGODB_READ_PREFERENCE: str = os.getenv("MONGODB_READ_PREFERENCE", "primary")
+    MONGODB_WRITE_CONCERN: str = os.getenv("MONGODB_WRITE_CONCERN", "majority")  # "majority" or a node count
+    MONGODB_COMPRESSORS: str = os.getenv("MONGODB_COMPRESSORS", "")  # e.g. "zstd,snappy", needs the matching package
+    
     # Security
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key-here-change-in-production")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 7 days
@@ -17,6 +32,70 @@ class Settings(BaseSettings):
     # Firebase
     FIREBASE_CREDENTIALS_PATH: str = os.getenv("FIREBASE_CREDENTIALS_PATH", "./firebase-credentials.json")
     FIREBASE_PROJECT_ID: str = os.getenv("FIREBASE_PROJECT_ID", "personal-chat-cca45")
+    # URL, local JSON file, or empty to leave certificate handling to firebase_admin
+    FIREBASE_CERTS_SOURCE: str = os.getenv(
+        "FIREBASE_CERTS_SOURCE",
+        "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+    )
+    FIREBASE_CERTS_REFRESH_MARGIN: int = int(os.getenv("FIREBASE_CERTS_REFRESH_MARGIN", "300"))  # seconds before max-age
+    TOKEN_CACHE_MAX_SIZE: int = int(os.getenv("TOKEN_CACHE_MAX_SIZE", "10000"))  # verified tokens kept in memory
+    
+    # Users resolved by Firebase UID, cached per worker
+    USER_CACHE_TTL: int = int(os.getenv("USER_CACHE_TTL", "30"))  # seconds
+    USER_CACHE_MAX_SIZE: int = int(os.getenv("USER_CACHE_MAX_SIZE", "10000"))
+    
+    # Response cache: "memory" (per worker) or "redis" (shared, needs the redis package)
+    CACHE_BACKEND: str = os.getenv("CACHE_BACKEND", "memory")
+    REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+    CACHE_MAX_SIZE: int = int(os.getenv("CACHE_MAX_SIZE", "1024"))
+    LEADERBOARD_CACHE_TTL: int = int(os.getenv("LEADERBOARD_CACHE_TTL", "60"))  # seconds
+    LEADERBOARD_CACHE_SOFT_TTL: int = int(os.getenv("LEADERBOARD_CACHE_SOFT_TTL", "0"))  # seconds, 0 disables serving stale
+    LEADERBOARD_RANK_LIMIT: int = int(os.getenv("LEADERBOARD_RANK_LIMIT", "10000"))  # ranks counted exactly; deeper ones are reported as null
+    PHOTO_COUNT_CACHE_TTL: int = int(os.getenv("PHOTO_COUNT_CACHE_TTL", "60"))  # seconds, per worker
+    
+    # Progress sync
+    PROGRESS_BULK_MAX_ENTRIES: int = int(os.getenv("PROGRESS_BULK_MAX_ENTRIES", "100"))  # entries per POST /progress/bulk
+    IDEMPOTENCY_KEY_TTL: int = int(os.getenv("IDEMPOTENCY_KEY_TTL", "86400"))  # seconds a stored response can be replayed
+    
+    # Background jobs, persisted in the jobs collection
+    JOB_POLL_INTERVAL: float = float(os.getenv("JOB_POLL_INTERVAL", "5"))  # seconds between checks for due jobs
+    JOB_LEASE_TIMEOUT: int = int(os.getenv("JOB_LEASE_TIMEOUT", "600"))  # seconds before a running job is taken over
+    JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+    JOB_RETRY_BASE_DELAY: float = float(os.getenv("JOB_RETRY_BASE_DELAY", "5"))  # seconds, doubled per attempt
+    JOB_RETRY_MAX_DELAY: float = float(os.getenv("JOB_RETRY_MAX_DELAY", "600"))
+    JOB_RETENTION: int = int(os.getenv("JOB_RETENTION", str(7 * 24 * 3600)))  # seconds finished jobs are kept
+    
+    # Photo file storage: "local" (this node's disk) or "s3" (any S3-compatible store, needs boto3)
+    STORAGE_BACKEND: str = os.getenv("STORAGE_BACKEND", "local")
+    STORAGE_LOCAL_ROOT: str = os.getenv("STORAGE_LOCAL_ROOT", "uploads/photos")
+    STORAGE_LOCAL_URL_PREFIX: str = os.getenv("STORAGE_LOCAL_URL_PREFIX", "/uploads/photos")
+    S3_BUCKET: str = os.getenv("S3_BUCKET", "")
+    S3_PREFIX: str = os.getenv("S3_PREFIX", "photos/")
+    S3_ENDPOINT_URL: str = os.getenv("S3_ENDPOINT_URL", "")  # e.g. http://localhost:9000 for MinIO
+    S3_REGION: str = os.getenv("S3_REGION", "")
+    S3_ACCESS_KEY_ID: str = os.getenv("S3_ACCESS_KEY_ID", "")
+    S3_SECRET_ACCESS_KEY: str = os.getenv("S3_SECRET_ACCESS_KEY", "")
+    S3_PRESIGN_TTL: int = int(os.getenv("S3_PRESIGN_TTL", "3600"))  # seconds pre-signed read URLs stay valid
+    S3_PUBLIC_BASE_URL: str = os.getenv("S3_PUBLIC_BASE_URL", "")  # e.g. a CDN in front of a public bucket; skips signing
+    S3_MULTIPART_THRESHOLD: int = int(os.getenv("S3_MULTIPART_THRESHOLD", str(8 * 1024 * 1024)))  # bytes
+    S3_MULTIPART_CHUNK_SIZE: int = int(os.getenv("S3_MULTIPART_CHUNK_SIZE", str(8 * 1024 * 1024)))  # bytes
+    
+    # Serving stored photos from this node
+    MEDIA_IMMUTABLE_MAX_AGE: int = int(os.getenv("MEDIA_IMMUTABLE_MAX_AGE", "31536000"))  # seconds, content-addressed files
+    MEDIA_CACHE_MAX_AGE: int = int(os.getenv("MEDIA_CACHE_MAX_AGE", "3600"))  # seconds, older uuid-named files
+    MEDIA_ACCEL_REDIRECT_PREFIX: str = os.getenv("MEDIA_ACCEL_REDIRECT_PREFIX", "")  # e.g. /protected-photos for nginx
+    
+    # Photo uploads are streamed to disk in chunks and capped in size
+    PHOTO_MAX_UPLOAD_SIZE: int = int(os.getenv("PHOTO_MAX_UPLOAD_SIZE", str(20 * 1024 * 1024)))  # bytes
+    PHOTO_UPLOAD_CHUNK_SIZE: int = int(os.getenv("PHOTO_UPLOAD_CHUNK_SIZE", str(256 * 1024)))  # bytes
+    
+    # Photo variants, generated in a process pool on upload
+    PHOTO_VARIANT_WIDTHS: str = os.getenv("PHOTO_VARIANT_WIDTHS", "320,640,1280")  # comma-separated, in pixels
+    PHOTO_VARIANT_FORMATS: str = os.getenv("PHOTO_VARIANT_FORMATS", "webp,jpeg")  # comma-separated; the first is used for thumbnails
+    PHOTO_JPEG_QUALITY: int = int(os.getenv("PHOTO_JPEG_QUALITY", "82"))
+    PHOTO_WEBP_QUALITY: int = int(os.getenv("PHOTO_WEBP_QUALITY", "80"))
+    PHOTO_PLACEHOLDER_WIDTH: int = int(os.getenv("PHOTO_PLACEHOLDER_WIDTH", "16"))  # pixels, inline blur-up image
+    PHOTO_PROCESS_WORKERS: int = int(os.getenv("PHOTO_PROCESS_WORKERS", "2"))
 
 # Create settings instance
 settings = Settings() 
\ No newline at end of file
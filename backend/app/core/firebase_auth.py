@@ -1,9 +1,19 @@
-from typing import Optional
+from typing import Optional, Dict, Any, Tuple, Callable, Union
+from collections import OrderedDict
+import asyncio
+import hashlib
+import json
 import logging
+import re
+import time
+import urllib.request
 from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import firebase_admin
 from firebase_admin import credentials, auth
+from google.auth import jwt as google_jwt
+from app.core.config import settings
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -24,6 +34,191 @@ except ValueError:
 
 security = HTTPBearer(auto_error=False)
 
+CertsLoader = Callable[[], Tuple[Dict[str, str], int]]
+
+class PublicKeyStore:
+    """
+    Google's ID-token signing certificates, shared by all requests.
+    The certificates are loaded at startup and refreshed in the background
+    before their `max-age` runs out. `source` is an https URL, a local JSON
+    file of `{kid: pem}`, or a callable returning `(certs, max_age)`.
+    """
+
+    DEFAULT_MAX_AGE = 3600
+    RETRY_INTERVAL = 30
+
+    def __init__(self, source: Union[str, CertsLoader, None], refresh_margin: int = 300):
+        self.source = source
+        self.refresh_margin = refresh_margin
+        self.expires_at = 0.0
+        self._certs: Dict[str, str] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._refresh_lock = asyncio.Lock()
+
+    @property
+    def certs(self) -> Dict[str, str]:
+        return self._certs
+
+    def set_certs(self, certs: Dict[str, str], max_age: int = DEFAULT_MAX_AGE) -> None:
+        """Replace the certificates, e.g. from a test stub."""
+        self._certs = dict(certs)
+        self.expires_at = time.time() + max_age
+
+    def _fetch(self) -> Tuple[Dict[str, str], int]:
+        if callable(self.source):
+            return self.source()
+        if self.source.startswith(("http://", "https://")):
+            with urllib.request.urlopen(self.source, timeout=10) as response:
+                cache_control = response.headers.get("Cache-Control", "")
+                certs = json.loads(response.read().decode("utf-8"))
+            match = re.search(r"max-age=(\d+)", cache_control)
+            return certs, int(match.group(1)) if match else self.DEFAULT_MAX_AGE
+        with open(self.source, "r") as f:
+            return json.load(f), self.DEFAULT_MAX_AGE
+
+    async def refresh(self) -> None:
+        """Fetch the certificates now."""
+        async with self._refresh_lock:
+            certs, max_age = await run_in_threadpool(self._fetch)
+            self.set_certs(certs, max_age)
+            logger.info(f"Loaded {len(certs)} token signing certificates (max-age {max_age}s)")
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            delay = max(self.expires_at - self.refresh_margin - time.time(), self.RETRY_INTERVAL)
+            await asyncio.sleep(delay)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Error refreshing token signing certificates: {str(e)}")
+
+    async def start(self) -> None:
+        """Load the certificates and start the background refresh."""
+        if not self.source or self._task is not None:
+            return
+        try:
+            await self.refresh()
+        except Exception as e:
+            # Verification falls back to firebase_admin until a refresh succeeds
+            logger.error(f"Error loading token signing certificates: {str(e)}")
+        self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        """Stop the background refresh."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+def _get_project_id() -> str:
+    try:
+        return firebase_admin.get_app().project_id or settings.FIREBASE_PROJECT_ID
+    except ValueError:
+        return settings.FIREBASE_PROJECT_ID
+
+def verify_token_with_certs(token: str, certs: Dict[str, str], project_id: str) -> Dict[str, Any]:
+    """Verify a Firebase ID token against pre-fetched certificates, as firebase_admin does."""
+    claims = google_jwt.decode(token, certs=certs, audience=project_id, clock_skew_in_seconds=0)
+    if claims.get("iss") != f"https://securetoken.google.com/{project_id}":
+        raise ValueError("Firebase ID token has incorrect \"iss\" (issuer) claim")
+    subject = claims.get("sub")
+    if not isinstance(subject, str) or not subject or len(subject) > 128:
+        raise ValueError("Firebase ID token has an invalid \"sub\" (subject) claim")
+    claims["uid"] = subject
+    return claims
+
+key_store = PublicKeyStore(settings.FIREBASE_CERTS_SOURCE, refresh_margin=settings.FIREBASE_CERTS_REFRESH_MARGIN)
+
+class TokenVerifier:
+    """
+    Verifies Firebase ID tokens without blocking the event loop.
+    Verified claims are cached by token hash until the token's `exp`,
+    with LRU eviction once `max_size` tokens are held.
+    """
+
+    # Drop cached claims a little before `exp` to allow for clock skew
+    EXPIRY_MARGIN_SECONDS = 5
+
+    def __init__(self, max_size: int = 10000, key_store: Optional[PublicKeyStore] = None):
+        self.max_size = max_size
+        self.key_store = key_store
+        self.hits = 0
+        self.misses = 0
+        self._cache: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._pending: Dict[str, asyncio.Task] = {}
+
+    @staticmethod
+    def _cache_key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def _get_cached(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        claims, expires_at = entry
+        if expires_at <= time.time():
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return claims
+
+    def _store(self, key: str, claims: Dict[str, Any]) -> None:
+        expires_at = float(claims.get("exp", 0)) - self.EXPIRY_MARGIN_SECONDS
+        if expires_at <= time.time():
+            return
+        self._cache[key] = (claims, expires_at)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+
+    def _decode(self, token: str) -> Dict[str, Any]:
+        certs = self.key_store.certs if self.key_store else None
+        if certs and google_jwt.decode_header(token).get("kid") in certs:
+            return verify_token_with_certs(token, certs, _get_project_id())
+        # No usable pre-fetched key (not loaded yet, or keys rotated), let firebase_admin fetch
+        return auth.verify_id_token(token, check_revoked=False)
+
+    async def _verify_and_store(self, key: str, token: str) -> Dict[str, Any]:
+        # Signature checks are blocking, so run them in the threadpool
+        claims = await run_in_threadpool(self._decode, token)
+        self._store(key, claims)
+        return claims
+
+    async def verify(self, token: str) -> Dict[str, Any]:
+        """Return the decoded claims for a token, verifying it only on a cache miss."""
+        key = self._cache_key(token)
+        claims = self._get_cached(key)
+        if claims is not None:
+            self.hits += 1
+            return claims
+
+        self.misses += 1
+        # Concurrent requests carrying the same token share a single verification
+        task = self._pending.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._verify_and_store(key, token))
+            self._pending[key] = task
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+        return await asyncio.shield(task)
+
+    def clear(self) -> None:
+        """Drop all cached claims."""
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Return cache counters."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._cache),
+            "max_size": self.max_size,
+        }
+
+token_verifier = TokenVerifier(max_size=settings.TOKEN_CACHE_MAX_SIZE, key_store=key_store)
+
 async def get_current_user(credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)):
     """
     Verify Firebase ID token and return user information.
@@ -42,10 +237,7 @@ async def get_current_user(credentials: Optional[HTTPAuthorizationCredentials] =
     token = credentials.credentials
     try:
         # Verify the ID token
-        decoded_token = auth.verify_id_token(
-            token, 
-            check_revoked=False
-        )
+        decoded_token = await token_verifier.verify(token)
         uid = decoded_token.get("uid")
         email = decoded_token.get("email", "no-email@example.com")
         
@@ -94,10 +286,7 @@ async def get_optional_user(credentials: Optional[HTTPAuthorizationCredentials]
     token = credentials.credentials
     try:
         # Verify the ID token
-        decoded_token = auth.verify_id_token(
-            token, 
-            check_revoked=False
-        )
+        decoded_token = await token_verifier.verify(token)
         uid = decoded_token.get("uid")
         email = decoded_token.get("email", "no-email@example.com")
         
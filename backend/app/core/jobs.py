@@ -0,0 +1,228 @@
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from datetime import datetime, timedelta
+import asyncio
+import logging
+import os
+import random
+import socket
+from bson import ObjectId
+from pymongo import ReturnDocument
+from app.core.config import settings
+from app.db.mongodb import get_database
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[Optional[Dict[str, Any]]]]
+FailureHandler = Callable[[Dict[str, Any], str], Awaitable[None]]
+
+class PermanentJobError(Exception):
+    """Raised by a job handler when retrying the job can't help."""
+
+class JobType:
+    """A registered kind of job: its handler and how it is run."""
+
+    def __init__(
+        self,
+        name: str,
+        handler: JobHandler,
+        concurrency: int,
+        max_attempts: int,
+        on_failure: Optional[FailureHandler] = None
+    ):
+        self.name = name
+        self.handler = handler
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.on_failure = on_failure
+        self.wakeup = asyncio.Event()
+
+class JobQueue:
+    """
+    In-process queue for slow work, persisted in the `jobs` collection.
+    Each job type has its own workers, so one kind of work can't starve
+    another. Workers claim jobs atomically, so several API processes can
+    share the queue; a job left `running` by a process that died is picked up
+    again once its lease runs out. Failed jobs are retried with exponential
+    backoff until `max_attempts`.
+    """
+
+    collection_name = "jobs"
+
+    def __init__(
+        self,
+        poll_interval: float = 5,
+        lease_timeout: float = 600,
+        retry_base_delay: float = 5,
+        retry_max_delay: float = 600
+    ):
+        self.poll_interval = poll_interval
+        self.lease_timeout = lease_timeout
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._types: Dict[str, JobType] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    def register(
+        self,
+        name: str,
+        handler: JobHandler,
+        concurrency: int = 1,
+        max_attempts: int = settings.JOB_MAX_ATTEMPTS,
+        on_failure: Optional[FailureHandler] = None
+    ) -> None:
+        """
+        Register the handler for a job type. It gets the job's payload and may
+        return a result to store on the job. `on_failure` is called with the
+        job and the error once the job has failed for good.
+        """
+        self._types[name] = JobType(name, handler, concurrency, max_attempts, on_failure)
+
+    async def enqueue(self, name: str, payload: Dict[str, Any], created_by: Optional[str] = None) -> Dict[str, Any]:
+        """Persist a new job and wake a worker for it. Returns the job document."""
+        job_type = self._types.get(name)
+        if job_type is None:
+            raise ValueError(f"Unknown job type: {name}")
+        now = datetime.utcnow()
+        job = {
+            "_id": ObjectId(),
+            "type": name,
+            "payload": payload,
+            "status": "queued",
+            "attempts": 0,
+            "max_attempts": job_type.max_attempts,
+            "run_at": now,
+            "created_by": created_by,
+            "created_at": now,
+            "updated_at": now,
+        }
+        db = await get_database()
+        await db[self.collection_name].insert_one(job)
+        job_type.wakeup.set()
+        return job
+
+    async def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        if not ObjectId.is_valid(job_id):
+            return None
+        db = await get_database()
+        return await db[self.collection_name].find_one({"_id": ObjectId(job_id)})
+
+    async def _claim(self, job_type: JobType) -> Optional[Dict[str, Any]]:
+        """Take the next due job of a type, or one whose worker's lease ran out."""
+        now = datetime.utcnow()
+        db = await get_database()
+        return await db[self.collection_name].find_one_and_update(
+            {
+                "type": job_type.name,
+                "$or": [
+                    {"status": "queued", "run_at": {"$lte": now}},
+                    {"status": "running", "locked_until": {"$lte": now}},
+                ],
+            },
+            {
+                "$set": {
+                    "status": "running",
+                    "locked_by": self.worker_id,
+                    "locked_until": now + timedelta(seconds=self.lease_timeout),
+                    "updated_at": now,
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("run_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def _retry_delay(self, attempts: int) -> float:
+        """Exponential backoff with jitter, so failing jobs don't retry in lockstep."""
+        delay = min(self.retry_base_delay * 2 ** (attempts - 1), self.retry_max_delay)
+        return delay * random.uniform(0.5, 1)
+
+    async def _finish(self, job: Dict[str, Any], fields: Dict[str, Any], unset_lock: bool = True) -> None:
+        db = await get_database()
+        update: Dict[str, Any] = {"$set": {**fields, "updated_at": datetime.utcnow()}}
+        if unset_lock:
+            update["$unset"] = {"locked_by": "", "locked_until": ""}
+        # Only if this worker still holds the job
+        await db[self.collection_name].update_one(
+            {"_id": job["_id"], "locked_by": self.worker_id, "status": "running"},
+            update
+        )
+
+    async def _fail(self, job_type: JobType, job: Dict[str, Any], error: str) -> None:
+        logger.error(f"Job {job['_id']} ({job_type.name}) failed: {error}")
+        now = datetime.utcnow()
+        await self._finish(job, {"status": "failed", "error": error, "finished_at": now})
+        if job_type.on_failure:
+            try:
+                await job_type.on_failure(job, error)
+            except Exception as e:
+                logger.error(f"Error in failure handler of job {job['_id']}: {str(e)}")
+
+    async def _run(self, job_type: JobType, job: Dict[str, Any]) -> None:
+        if job["attempts"] > job["max_attempts"]:
+            # Its workers kept dying while running it
+            await self._fail(job_type, job, "Worker lease expired too many times")
+            return
+        try:
+            result = await job_type.handler(job["payload"])
+        except asyncio.CancelledError:
+            # Shutting down: hand the job back without counting the attempt
+            await self._finish(job, {"status": "queued", "run_at": datetime.utcnow(), "attempts": job["attempts"] - 1})
+            raise
+        except PermanentJobError as e:
+            await self._fail(job_type, job, str(e))
+            return
+        except Exception as e:
+            if job["attempts"] >= job["max_attempts"]:
+                await self._fail(job_type, job, str(e))
+                return
+            delay = self._retry_delay(job["attempts"])
+            logger.warning(f"Job {job['_id']} ({job_type.name}) failed, retrying in {delay:.0f}s: {str(e)}")
+            await self._finish(job, {
+                "status": "queued",
+                "error": str(e),
+                "run_at": datetime.utcnow() + timedelta(seconds=delay),
+            })
+            return
+        await self._finish(job, {"status": "succeeded", "result": result, "error": None, "finished_at": datetime.utcnow()})
+
+    async def _worker(self, job_type: JobType) -> None:
+        while True:
+            try:
+                job_type.wakeup.clear()
+                job = await self._claim(job_type)
+                if job is None:
+                    try:
+                        await asyncio.wait_for(job_type.wakeup.wait(), timeout=self.poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                await self._run(job_type, job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error in {job_type.name} job worker: {str(e)}")
+                await asyncio.sleep(self.poll_interval)
+
+    async def start(self) -> None:
+        """Start the workers of every registered job type."""
+        if self._tasks:
+            return
+        for job_type in self._types.values():
+            for _ in range(job_type.concurrency):
+                self._tasks.append(asyncio.create_task(self._worker(job_type)))
+        logger.info(f"Started job workers: {', '.join(f'{t.name} x{t.concurrency}' for t in self._types.values())}")
+
+    async def stop(self) -> None:
+        """Stop the workers; jobs they were running go back on the queue."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+job_queue = JobQueue(
+    poll_interval=settings.JOB_POLL_INTERVAL,
+    lease_timeout=settings.JOB_LEASE_TIMEOUT,
+    retry_base_delay=settings.JOB_RETRY_BASE_DELAY,
+    retry_max_delay=settings.JOB_RETRY_MAX_DELAY
+)
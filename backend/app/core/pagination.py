@@ -0,0 +1,56 @@
+import base64
+import binascii
+import json
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from bson import json_util
+from fastapi import HTTPException, status
+
+# Response header carrying the cursor for endpoints that return a bare list
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(sort_field: str, value: Any, last_id: Any) -> str:
+    """Build an opaque cursor pointing just after the item with `value` and `last_id`."""
+    # _id keeps its BSON type; some collections store string ids
+    payload = json_util.dumps({"f": sort_field, "v": value, "id": last_id})
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str, sort_field: str) -> Tuple[Any, Any]:
+    """Return the (sort value, _id) a cursor points after."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json_util.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+        field, value, last_id = payload["f"], payload["v"], payload["id"]
+    except (ValueError, KeyError, TypeError, binascii.Error, json.JSONDecodeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    if field != sort_field:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor does not match the requested sort order")
+    return value, last_id
+
+def sort_spec(sort_field: str, direction: int) -> List[Tuple[str, int]]:
+    """Sort by the field with _id as tie-breaker, so the order is total and stable."""
+    if sort_field == "_id":
+        return [("_id", direction)]
+    return [(sort_field, direction), ("_id", direction)]
+
+def keyset_filter(cursor: str, sort_field: str, direction: int) -> Dict[str, Any]:
+    """Query matching the items that come after the cursor in `sort_spec` order."""
+    value, last_id = decode_cursor(cursor, sort_field)
+    op = "$gt" if direction > 0 else "$lt"
+    if sort_field == "_id":
+        return {"_id": {op: last_id}}
+    # Null and missing values sort before everything else, and comparison
+    # operators never match them, so they need their own branches
+    tie = {sort_field: value, "_id": {op: last_id}}
+    if value is None:
+        return {"$or": [tie, {sort_field: {"$ne": None}}]} if direction > 0 else tie
+    branches = [{sort_field: {op: value}}, tie]
+    if direction < 0:
+        branches.append({sort_field: None})
+    return {"$or": branches}
+
+def next_cursor(docs: Sequence[Dict[str, Any]], limit: int, sort_field: str) -> Optional[str]:
+    """Cursor for the page after `docs` (raw documents), or None when this was the last page."""
+    if not docs or len(docs) < limit:
+        return None
+    last = docs[-1]
+    return encode_cursor(sort_field, last.get(sort_field) if sort_field != "_id" else last["_id"], last["_id"])
@@ -0,0 +1,184 @@
+from typing import Optional
+import logging
+import os
+import shutil
+from starlette.concurrency import run_in_threadpool
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class StorageBackend:
+    """
+    Interface for the object stores holding uploaded files.
+    Objects are addressed by a relative name such as "ab/cd/<sha256>.jpg".
+    """
+
+    async def exists(self, name: str) -> bool:
+        raise NotImplementedError
+
+    async def put_file(self, local_path: str, name: str, content_type: str) -> None:
+        """Store a local file under `name`. The local file is consumed."""
+        raise NotImplementedError
+
+    async def download(self, name: str, local_path: str) -> None:
+        """Copy the object to a local file."""
+        raise NotImplementedError
+
+    async def delete(self, name: str) -> None:
+        raise NotImplementedError
+
+    def url(self, name: str, base_url: str) -> str:
+        """URL clients should fetch the object from."""
+        raise NotImplementedError
+
+    def local_path(self, name: str) -> Optional[str]:
+        """Path of the object on this node's filesystem, if it is stored there."""
+        return None
+
+class LocalStorageBackend(StorageBackend):
+    """Files in a directory on this node, served from `url_prefix` by the app."""
+
+    def __init__(self, root: str, url_prefix: str):
+        self.root = root
+        self.url_prefix = url_prefix
+
+    def local_path(self, name: str) -> Optional[str]:
+        relative = os.path.normpath(name)
+        if relative.startswith("..") or os.path.isabs(relative):
+            return None
+        return os.path.join(self.root, relative)
+
+    async def exists(self, name: str) -> bool:
+        path = self.local_path(name)
+        return path is not None and os.path.exists(path)
+
+    async def put_file(self, local_path: str, name: str, content_type: str) -> None:
+        path = self.local_path(name)
+        if path is None:
+            raise ValueError(f"Invalid object name: {name}")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Atomic as long as the file comes from the same filesystem (uploads/tmp)
+        os.replace(local_path, path)
+
+    async def download(self, name: str, local_path: str) -> None:
+        path = self.local_path(name)
+        if path is None:
+            raise ValueError(f"Invalid object name: {name}")
+        await run_in_threadpool(shutil.copyfile, path, local_path)
+
+    async def delete(self, name: str) -> None:
+        path = self.local_path(name)
+        if path and os.path.exists(path):
+            os.remove(path)
+
+    def url(self, name: str, base_url: str) -> str:
+        return f"{base_url.rstrip('/')}{self.url_prefix}/{name}"
+
+class S3StorageBackend(StorageBackend):
+    """
+    Backend for any store speaking the S3 protocol (AWS S3, MinIO, ...).
+    Large files are uploaded in parts, and clients read objects through
+    pre-signed URLs, so image bytes never pass through the API.
+    Needs the optional `boto3` package.
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "",
+        endpoint_url: Optional[str] = None,
+        region: Optional[str] = None,
+        access_key_id: Optional[str] = None,
+        secret_access_key: Optional[str] = None,
+        presign_ttl: int = 3600,
+        public_base_url: Optional[str] = None,
+        multipart_threshold: int = 8 * 1024 * 1024,
+        multipart_chunk_size: int = 8 * 1024 * 1024
+    ):
+        try:
+            import boto3
+            from boto3.s3.transfer import TransferConfig
+        except ImportError:
+            raise RuntimeError("STORAGE_BACKEND=s3 requires the 'boto3' package")
+        self.bucket = bucket
+        self.prefix = prefix
+        self.presign_ttl = presign_ttl
+        self.public_base_url = public_base_url.rstrip("/") if public_base_url else None
+        self._client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url or None,
+            region_name=region or None,
+            aws_access_key_id=access_key_id or None,
+            aws_secret_access_key=secret_access_key or None
+        )
+        self._transfer_config = TransferConfig(
+            multipart_threshold=multipart_threshold,
+            multipart_chunksize=multipart_chunk_size
+        )
+        # Signed URLs are reused for half their lifetime, so repeat views hit the browser cache
+        self._url_cache = TTLCache(max_size=settings.CACHE_MAX_SIZE, ttl=presign_ttl / 2)
+
+    def _key(self, name: str) -> str:
+        return f"{self.prefix}{name}"
+
+    async def exists(self, name: str) -> bool:
+        from botocore.exceptions import ClientError
+        try:
+            await run_in_threadpool(self._client.head_object, Bucket=self.bucket, Key=self._key(name))
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    async def put_file(self, local_path: str, name: str, content_type: str) -> None:
+        # upload_file switches to a multipart upload above the threshold
+        await run_in_threadpool(
+            self._client.upload_file,
+            local_path,
+            self.bucket,
+            self._key(name),
+            ExtraArgs={"ContentType": content_type},
+            Config=self._transfer_config
+        )
+        os.remove(local_path)
+
+    async def download(self, name: str, local_path: str) -> None:
+        await run_in_threadpool(self._client.download_file, self.bucket, self._key(name), local_path)
+
+    async def delete(self, name: str) -> None:
+        await run_in_threadpool(self._client.delete_object, Bucket=self.bucket, Key=self._key(name))
+
+    def url(self, name: str, base_url: str) -> str:
+        if self.public_base_url:
+            return f"{self.public_base_url}/{self._key(name)}"
+        url = self._url_cache.get(name)
+        if url is None:
+            # Signing is local computation, no request is made
+            url = self._client.generate_presigned_url(
+                "get_object",
+                Params={"Bucket": self.bucket, "Key": self._key(name)},
+                ExpiresIn=self.presign_ttl
+            )
+            self._url_cache.set(name, url)
+        return url
+
+def create_storage_backend() -> StorageBackend:
+    """Build the backend selected by STORAGE_BACKEND."""
+    if settings.STORAGE_BACKEND == "s3":
+        return S3StorageBackend(
+            bucket=settings.S3_BUCKET,
+            prefix=settings.S3_PREFIX,
+            endpoint_url=settings.S3_ENDPOINT_URL,
+            region=settings.S3_REGION,
+            access_key_id=settings.S3_ACCESS_KEY_ID,
+            secret_access_key=settings.S3_SECRET_ACCESS_KEY,
+            presign_ttl=settings.S3_PRESIGN_TTL,
+            public_base_url=settings.S3_PUBLIC_BASE_URL,
+            multipart_threshold=settings.S3_MULTIPART_THRESHOLD,
+            multipart_chunk_size=settings.S3_MULTIPART_CHUNK_SIZE
+        )
+    return LocalStorageBackend(settings.STORAGE_LOCAL_ROOT, settings.STORAGE_LOCAL_URL_PREFIX)
+
+storage_backend = create_storage_backend()
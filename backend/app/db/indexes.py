@@ -0,0 +1,157 @@
+"""
+Index definitions for every collection, applied at startup.
+
+Run `python -m app.db.indexes` to apply them by hand, or
+`python -m app.db.indexes --check` to report missing and unused indexes.
+"""
+import argparse
+import asyncio
+import logging
+import sys
+from typing import Dict, List
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("firebase_uid", ASCENDING)], name="firebase_uid_unique", unique=True),
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        # Older user records have no BIB number, so only enforce uniqueness on assigned ones
+        IndexModel(
+            [("bib_number", ASCENDING)],
+            name="bib_number_unique",
+            unique=True,
+            partialFilterExpression={"bib_number": {"$type": "string"}},
+        ),
+        IndexModel([("created_at", ASCENDING), ("_id", ASCENDING)], name="created_at_id"),
+    ],
+    "events": [
+        IndexModel([("created_at", ASCENDING), ("_id", ASCENDING)], name="created_at_id"),
+    ],
+    "registrations": [
+        IndexModel([("event_id", ASCENDING), ("user_id", ASCENDING)], name="event_user_unique", unique=True),
+        IndexModel([("user_id", ASCENDING)], name="user_id"),
+        IndexModel([("firebase_uid", ASCENDING), ("event_id", ASCENDING)], name="firebase_uid_event"),
+    ],
+    "progress": [
+        # Leaderboard and event progress; also covers lookups by event_id alone
+        IndexModel(
+            [("event_id", ASCENDING), ("user_id", ASCENDING), ("created_at", ASCENDING)],
+            name="event_user_created",
+        ),
+        IndexModel([("user_id", ASCENDING), ("event_id", ASCENDING)], name="user_event"),
+    ],
+    "leaderboard": [
+        IndexModel([("event_id", ASCENDING), ("user_id", ASCENDING)], name="event_user_unique", unique=True),
+        # A user's totals across events, for progress summaries
+        IndexModel([("user_id", ASCENDING), ("event_id", ASCENDING)], name="user_event"),
+        # Ranking order for distance-based and time-based events
+        IndexModel(
+            [("event_id", ASCENDING), ("total_distance", DESCENDING), ("last_update", ASCENDING), ("user_id", ASCENDING)],
+            name="event_distance_rank",
+        ),
+        IndexModel(
+            [("event_id", ASCENDING), ("total_time", DESCENDING), ("last_update", ASCENDING), ("user_id", ASCENDING)],
+            name="event_time_rank",
+        ),
+    ],
+    "progress_rollups": [
+        # user_id is "*" for event-wide buckets
+        IndexModel(
+            [("event_id", ASCENDING), ("bucket", ASCENDING), ("user_id", ASCENDING), ("period", ASCENDING)],
+            name="event_bucket_user_period_unique",
+            unique=True,
+        ),
+    ],
+    "idempotency_keys": [
+        IndexModel([("user_id", ASCENDING), ("scope", ASCENDING), ("key", ASCENDING)], name="user_scope_key_unique", unique=True),
+        # Bounds the store: keys are dropped once they can no longer be replayed
+        IndexModel([("created_at", ASCENDING)], name="created_at_ttl", expireAfterSeconds=settings.IDEMPOTENCY_KEY_TTL),
+    ],
+    # Keyset paging sorts on (field, _id)
+    "photos": [
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)], name="created_at_id_desc"),
+        # Photos sharing stored content; counting them is the file's reference count
+        IndexModel([("content_key", ASCENDING)], name="content_key", sparse=True),
+        IndexModel([("photo_date", ASCENDING), ("_id", ASCENDING)], name="photo_date_id"),
+    ],
+    "articles": [
+        IndexModel(
+            [("category", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="category_created_at_id",
+        ),
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)], name="created_at_id_desc"),
+    ],
+    "jobs": [
+        # Workers claim the next due job of their type
+        IndexModel([("type", ASCENDING), ("status", ASCENDING), ("run_at", ASCENDING)], name="type_status_run_at"),
+        # Finished jobs only have finished_at, so only they expire
+        IndexModel([("finished_at", ASCENDING)], name="finished_at_ttl", expireAfterSeconds=settings.JOB_RETENTION),
+    ],
+}
+
+async def ensure_indexes(db) -> None:
+    """Create any missing indexes. Safe to run repeatedly."""
+    for collection_name, indexes in INDEXES.items():
+        try:
+            created = await db[collection_name].create_indexes(indexes)
+            logger.info(f"Indexes ensured on {collection_name}: {', '.join(created)}")
+        except OperationFailure as e:
+            # e.g. duplicate values blocking a unique index; don't stop the app from starting
+            logger.error(f"Error creating indexes on {collection_name}: {str(e)}")
+
+async def check_indexes(db) -> Dict[str, Dict[str, List[str]]]:
+    """
+    Compare the indexes in the database with INDEXES.
+    Returns, per collection, the declared indexes that are missing and
+    the existing indexes that have not been used since the server started.
+    """
+    report = {}
+    for collection_name, indexes in INDEXES.items():
+        collection = db[collection_name]
+        existing = {}
+        async for index in collection.list_indexes():
+            existing[index["name"]] = index
+        
+        missing = [index.document["name"] for index in indexes if index.document["name"] not in existing]
+        
+        unused = []
+        try:
+            async for stats in collection.aggregate([{"$indexStats": {}}]):
+                if stats["name"] != "_id_" and stats["accesses"]["ops"] == 0:
+                    unused.append(stats["name"])
+        except OperationFailure as e:
+            logger.warning(f"Could not read index usage for {collection_name}: {str(e)}")
+        
+        report[collection_name] = {"missing": missing, "unused": sorted(unused)}
+    return report
+
+async def _main(check: bool) -> int:
+    from app.db.mongodb import connect_to_mongodb, close_mongodb_connection, get_database
+    # Connecting applies the indexes, unless only checking them
+    await connect_to_mongodb(create_indexes=not check)
+    try:
+        if not check:
+            return 0
+        
+        db = await get_database()
+        report = await check_indexes(db)
+        has_missing = False
+        for collection_name, result in report.items():
+            print(f"{collection_name}:")
+            print(f"  missing: {', '.join(result['missing']) or '-'}")
+            print(f"  unused:  {', '.join(result['unused']) or '-'}")
+            has_missing = has_missing or bool(result["missing"])
+        return 1 if has_missing else 0
+    finally:
+        await close_mongodb_connection()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply or check MongoDB indexes.")
+    parser.add_argument("--check", action="store_true", help="report missing and unused indexes without changing anything")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(_main(args.check)))
@@ -1,41 +1,140 @@
-import os
 import logging
+import threading
+import time
+from typing import Optional, Dict, Any
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
 from pymongo.errors import ConnectionFailure
-from dotenv import load_dotenv
 from ..core.config import settings
+from .indexes import ensure_indexes
 
 # Set up logger
 logger = logging.getLogger(__name__)
 
-# Load environment variables
-load_dotenv()
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Collects connection pool usage from the driver's CMAP events."""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Checkouts run on the driver's worker threads, so track wait start per thread
+        self._local = threading.local()
+        self.open_connections = 0
+        self.in_use = 0
+        self.max_in_use = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+    
+    def _record_wait(self) -> None:
+        started = getattr(self._local, "checkout_started", None)
+        if started is None:
+            return
+        self._local.checkout_started = None
+        wait_ms = (time.perf_counter() - started) * 1000
+        self.total_wait_ms += wait_ms
+        self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+    
+    def connection_check_out_started(self, event):
+        self._local.checkout_started = time.perf_counter()
+    
+    def connection_checked_out(self, event):
+        with self._lock:
+            self._record_wait()
+            self.checkouts += 1
+            self.in_use += 1
+            self.max_in_use = max(self.max_in_use, self.in_use)
+    
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self._record_wait()
+            self.checkout_failures += 1
+    
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.in_use = max(self.in_use - 1, 0)
+    
+    def connection_created(self, event):
+        with self._lock:
+            self.open_connections += 1
+    
+    def connection_closed(self, event):
+        with self._lock:
+            self.open_connections = max(self.open_connections - 1, 0)
+    
+    def pool_created(self, event):
+        pass
+    
+    def pool_ready(self, event):
+        pass
+    
+    def pool_cleared(self, event):
+        pass
+    
+    def pool_closed(self, event):
+        pass
+    
+    def connection_ready(self, event):
+        pass
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return a snapshot of the pool counters."""
+        with self._lock:
+            return {
+                "max_pool_size": settings.MONGODB_MAX_POOL_SIZE,
+                "open_connections": self.open_connections,
+                "in_use": self.in_use,
+                "max_in_use": self.max_in_use,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "avg_wait_ms": round(self.total_wait_ms / self.checkouts, 3) if self.checkouts else 0.0,
+                "max_wait_ms": round(self.max_wait_ms, 3),
+            }
 
-# Get MongoDB connection URL from environment or use default
-mongodb_url = os.getenv("MONGODB_URL", "mongodb://localhost:27017/")
-mongodb_db_name = os.getenv("MONGODB_DB_NAME", settings.MONGODB_DB_NAME)
+pool_monitor = PoolMonitor()
 
-# Log connection settings
-logger.info(f"MongoDB URL: {mongodb_url}")
-logger.info(f"MongoDB DB Name: {mongodb_db_name}")
+# Created in connect_to_mongodb so each worker process builds its own pool
+client: Optional[AsyncIOMotorClient] = None
+db = None
 
-# Initialize MongoDB client
-client = AsyncIOMotorClient(mongodb_url)
-db = client[mongodb_db_name]
+def _write_concern() -> Any:
+    w = settings.MONGODB_WRITE_CONCERN
+    return int(w) if w.isdigit() else w
 
-# Initialize collections
-events_collection = db.events
-participants_collection = db.participants
-progress_collection = db.progress
-photos_collection = db.photos
+def create_client() -> AsyncIOMotorClient:
+    """Build a Motor client from the pool and timeout settings."""
+    options = {
+        "maxPoolSize": settings.MONGODB_MAX_POOL_SIZE,
+        "minPoolSize": settings.MONGODB_MIN_POOL_SIZE,
+        "maxIdleTimeMS": settings.MONGODB_MAX_IDLE_TIME_MS,
+        "serverSelectionTimeoutMS": settings.MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": settings.MONGODB_CONNECT_TIMEOUT_MS,
+        "readPreference": settings.MONGODB_READ_PREFERENCE,
+        "w": _write_concern(),
+        "event_listeners": [pool_monitor],
+    }
+    if settings.MONGODB_COMPRESSORS:
+        options["compressors"] = settings.MONGODB_COMPRESSORS
+    return AsyncIOMotorClient(settings.MONGODB_URI, **options)
 
-async def connect_to_mongodb():
-    """Connect to MongoDB and verify connection."""
+async def connect_to_mongodb(create_indexes: bool = True):
+    """Connect to MongoDB and verify connection, creating any missing indexes unless told not to."""
     global client, db
     try:
+        if client is None:
+            logger.info(f"MongoDB DB Name: {settings.MONGODB_DB_NAME}")
+            logger.info(
+                f"MongoDB pool: maxPoolSize={settings.MONGODB_MAX_POOL_SIZE} "
+                f"minPoolSize={settings.MONGODB_MIN_POOL_SIZE}"
+            )
+            client = create_client()
+            db = client[settings.MONGODB_DB_NAME]
+        
         # Verify the connection
         await client.admin.command('ping')
         logger.info("Connected to MongoDB successfully!")
+        if create_indexes:
+            await ensure_indexes(db)
         return db
     except ConnectionFailure as e:
         logger.error(f"Could not connect to MongoDB: {e}")
@@ -46,12 +145,15 @@ async def connect_to_mongodb():
 
 async def close_mongodb_connection():
     """Close MongoDB connection."""
-    global client
+    global client, db
     if client:
         client.close()
+        client = None
+        db = None
         logger.info("MongoDB connection closed.")
 
 async def get_database():
     """Return database instance."""
-    # We don't need to await anything here since client is already initialized
-    return db 
\ No newline at end of file
+    if db is None:
+        raise RuntimeError("MongoDB is not connected; call connect_to_mongodb() first")
+    return db
@@ -1,15 +1,21 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 import os
 from app.core.config import settings
+from app.core.pagination import NEXT_CURSOR_HEADER
 from app.api.api import api_router
-from app.db.mongodb import connect_to_mongodb, close_mongodb_connection
+from app.api.endpoints import media
+from app.db.mongodb import connect_to_mongodb, close_mongodb_connection, pool_monitor
+from app.core.firebase_auth import key_store
+from app.core.cache import cache_backend
+from app.core.jobs import job_queue
+from app.services.image_processing import shutdown_pool
 import uvicorn
 
 # Create uploads directory if it doesn't exist
 os.makedirs("uploads", exist_ok=True)
-os.makedirs("uploads/photos", exist_ok=True)
+if settings.STORAGE_BACKEND == "local":
+    os.makedirs(settings.STORAGE_LOCAL_ROOT, exist_ok=True)
 
 # Create FastAPI app
 app = FastAPI(
@@ -24,10 +30,11 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allows all methods
     allow_headers=["*"],  # Allows all headers
+    expose_headers=[NEXT_CURSOR_HEADER],  # Lets browsers read the keyset paging cursor
 )
 
-# Mount static files directory for uploads
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+# Stored photos, with long-lived caching, ETags and byte ranges
+app.include_router(media.router)
 
 # Include API router
 app.include_router(api_router, prefix=settings.API_V1_STR)
@@ -37,10 +44,35 @@ app.include_router(api_router, prefix=settings.API_V1_STR)
 async def startup_db_client():
     await connect_to_mongodb()
 
+@app.on_event("startup")
+async def startup_job_queue():
+    await job_queue.start()
+
+@app.on_event("startup")
+async def startup_key_store():
+    await key_store.start()
+
+@app.on_event("shutdown")
+async def shutdown_job_queue():
+    # Before the database connection closes, so running jobs can be handed back
+    await job_queue.stop()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
     await close_mongodb_connection()
 
+@app.on_event("shutdown")
+async def shutdown_key_store():
+    await key_store.stop()
+
+@app.on_event("shutdown")
+async def shutdown_cache():
+    await cache_backend.close()
+
+@app.on_event("shutdown")
+async def shutdown_image_processing():
+    shutdown_pool()
+
 # Root endpoint
 @app.get("/")
 async def root():
@@ -49,7 +81,12 @@ async def root():
 # Health check endpoint
 @app.get("/health")
 async def health():
-    return {"status": "ok"} 
+    return {"status": "ok"}
+
+# Connection pool usage for this worker
+@app.get("/health/db")
+async def health_db():
+    return {"status": "ok", "pool": pool_monitor.stats()} 
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=5005)
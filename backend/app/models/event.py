@@ -1,6 +1,6 @@
 from datetime import datetime
-from typing import Optional, List, Annotated
-from pydantic import BaseModel, Field, BeforeValidator
+from typing import Optional, List, Dict, Any, Annotated
+from pydantic import BaseModel, Field, BeforeValidator, TypeAdapter
 from bson import ObjectId
 
 def validate_object_id(v: str) -> str:
@@ -48,7 +48,7 @@ class EventUpdate(BaseModel):
 class EventInDB(EventBase):
     """Event model as stored in database."""
     id: PyObjectId = Field(alias="_id")
-    participants: List[str] = []  # List of participant user IDs
+    participant_count: int = 0
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: Optional[datetime] = None
 
@@ -61,4 +61,28 @@ class EventInDB(EventBase):
 
 class Event(EventInDB):
     """Event model for API responses."""
-    pass 
\ No newline at end of file
+    is_registered: Optional[bool] = None  # Whether the requesting user is registered
+
+class EventSummary(BaseModel):
+    """Lightweight event model for listings, without the description."""
+    id: PyObjectId = Field(alias="_id")
+    name: str
+    event_type: str
+    start_date: datetime
+    end_date: datetime
+    target_distance: Optional[float] = None
+    target_time: Optional[int] = None
+    participant_count: int = 0
+    created_at: Optional[datetime] = None
+    is_registered: Optional[bool] = None
+
+    model_config = {
+        "populate_by_name": True
+    }
+
+# Serializer for each event listing view
+EVENT_VIEW_ADAPTERS = {
+    "full": TypeAdapter(List[Event]),
+    "summary": TypeAdapter(List[EventSummary]),
+    "fields": TypeAdapter(List[Dict[str, Any]]),
+}
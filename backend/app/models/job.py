@@ -0,0 +1,31 @@
+from datetime import datetime
+from typing import Any, Dict, Optional, Annotated
+from pydantic import BaseModel, Field, BeforeValidator
+from bson import ObjectId
+
+def validate_object_id(v: str) -> str:
+    if isinstance(v, ObjectId):
+        return str(v)
+    if not ObjectId.is_valid(v):
+        raise ValueError("Invalid ObjectId")
+    return str(v)
+
+PyObjectId = Annotated[str, BeforeValidator(validate_object_id)]
+
+class Job(BaseModel):
+    """Status of a background job, for polling."""
+    id: PyObjectId = Field(alias="_id")
+    type: str
+    status: str  # queued, running, succeeded or failed
+    attempts: int = 0
+    max_attempts: int
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None  # last error, also set while a retry is pending
+    run_at: Optional[datetime] = None  # when a queued job is due
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    
+    model_config = {
+        "populate_by_name": True
+    }
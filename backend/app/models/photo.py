@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional, Annotated, Dict, Any
+from typing import Optional, Annotated, Dict, Any, List
 from pydantic import BaseModel, Field, BeforeValidator
 from bson import ObjectId
 
@@ -12,6 +12,14 @@ def validate_object_id(v: str) -> str:
 
 PyObjectId = Annotated[str, BeforeValidator(validate_object_id)]
 
+class PhotoVariant(BaseModel):
+    """A resized copy of a photo."""
+    url: str
+    width: int
+    height: int
+    format: str  # "webp" or "jpeg"
+    size: int  # in bytes
+
 class PhotoBase(BaseModel):
     """Base Photo model."""
     title: str
@@ -19,6 +27,19 @@ class PhotoBase(BaseModel):
     image_url: str
     photo_date: datetime = Field(default_factory=datetime.utcnow)  # Date the photo was taken
     created_by: str  # admin user ID who uploaded it
+    # Dimensions of the original, after applying its EXIF orientation
+    width: Optional[int] = None
+    height: Optional[int] = None
+    dominant_color: Optional[str] = None  # "#rrggbb"
+    placeholder: Optional[str] = None  # tiny blurred copy as a data URI
+    thumbnail_url: Optional[str] = None
+    variants: List[PhotoVariant] = []
+    # SHA-256 of the original; photos with the same key share its stored files
+    content_key: Optional[str] = None
+    content_type: Optional[str] = None
+    size: Optional[int] = None  # in bytes
+    # "processing" until the background job has generated the variants, then "ready" (or "failed")
+    status: str = "ready"
 
 class PhotoCreate(PhotoBase):
     """Photo creation model."""
@@ -36,9 +57,6 @@ class PhotoInDB(PhotoBase):
     id: PyObjectId = Field(default_factory=lambda: str(ObjectId()), alias="_id")
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: Optional[datetime] = None
-    # Aspect ratio info for frontend rendering
-    width: Optional[int] = None
-    height: Optional[int] = None
     
     model_config = {
         "populate_by_name": True,
@@ -64,10 +82,18 @@ class Photo(BaseModel):
     # Optional fields
     width: Optional[int] = None
     height: Optional[int] = None
+    dominant_color: Optional[str] = None
+    placeholder: Optional[str] = None
+    variants: List[PhotoVariant] = []
+    content_key: Optional[str] = None
+    content_type: Optional[str] = None
+    size: Optional[int] = None
+    status: str = "ready"
     
     # Additional fields added at runtime
     photo_url: Optional[str] = None
     thumbnail_url: Optional[str] = None
+    job_id: Optional[str] = None  # background job processing a new upload
     
     model_config = {
         "populate_by_name": True,
@@ -75,4 +101,26 @@ class Photo(BaseModel):
             ObjectId: str
         },
         "extra": "allow"  # Allow extra fields
-    } 
\ No newline at end of file
+    } 
+
+class PhotoGalleryItem(BaseModel):
+    """What the gallery grid needs to lay out and paint a photo before any image loads."""
+    id: str = Field(alias="_id")
+    title: str
+    description: Optional[str] = None
+    photo_date: datetime
+    width: Optional[int] = None
+    height: Optional[int] = None
+    dominant_color: Optional[str] = None
+    placeholder: Optional[str] = None
+    variants: List[PhotoVariant] = []
+    status: str = "ready"
+    
+    # Stored URL, only used to build photo_url
+    image_url: str = Field(exclude=True)
+    photo_url: Optional[str] = None
+    thumbnail_url: Optional[str] = None
+    
+    model_config = {
+        "populate_by_name": True
+    }
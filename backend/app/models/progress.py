@@ -1,5 +1,5 @@
 from datetime import datetime, date
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseModel, Field
 from bson import ObjectId
 from .event import PyObjectId
@@ -38,4 +38,34 @@ class ProgressInDB(ProgressBase):
 
 class Progress(ProgressInDB):
     """Progress model for API responses."""
-    pass 
\ No newline at end of file
+    pass
+
+class ProgressBulkCreate(BaseModel):
+    """Batch of progress entries synced at once."""
+    entries: List[ProgressCreate]
+
+class ProgressBulkItemResult(BaseModel):
+    """Outcome of one entry of a bulk progress request."""
+    index: int
+    status: str  # "created" or "error"
+    id: Optional[str] = None
+    detail: Optional[str] = None
+
+class ProgressBulkResult(BaseModel):
+    """Outcome of a bulk progress request, one result per submitted entry."""
+    created: int
+    failed: int
+    results: List[ProgressBulkItemResult]
+
+class ProgressSummary(BaseModel):
+    """A user's progress totals for one event."""
+    event_id: str
+    user_id: str
+    total_distance: float = 0  # in kilometers
+    total_time: int = 0  # in minutes
+    entries: int = 0
+    last_update: Optional[datetime] = None
+    target_distance: Optional[float] = None
+    target_time: Optional[int] = None
+    completion: Optional[float] = None  # share of the event target reached, capped at 1
+    completed: bool = False
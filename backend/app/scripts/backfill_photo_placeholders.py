@@ -0,0 +1,46 @@
+import asyncio
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from app.db.mongodb import connect_to_mongodb, close_mongodb_connection, get_database
+from app.services.image_processing import process_image_summary, shutdown_pool
+from app.services.photo_service import PhotoService
+from app.services.photo_storage import PhotoStorage
+
+async def backfill_photo_placeholders():
+    """
+    Store dimensions, dominant colour and placeholder on photos uploaded before
+    they were computed at upload time, so the gallery can lay them out.
+    Safe to run more than once.
+    """
+    await connect_to_mongodb()
+    try:
+        db = await get_database()
+        photos = db[PhotoService.collection_name]
+        os.makedirs(PhotoStorage.temp_dir, exist_ok=True)  # for downloads from object storage
+        
+        updated = failed = 0
+        async for photo in photos.find({"placeholder": None}, {"image_url": 1}):
+            name = PhotoStorage.name_for_url(photo.get("image_url"))
+            if not name:
+                failed += 1
+                continue
+            try:
+                async with PhotoStorage.local_copy(name) as source_path:
+                    summary = await process_image_summary(source_path)
+            except Exception as e:
+                print(f"Photo {photo['_id']}: could not read {name}: {str(e)}")
+                failed += 1
+                continue
+            await photos.update_one({"_id": photo["_id"]}, {"$set": summary})
+            updated += 1
+        
+        print(f"Updated {updated} photo(s), {failed} could not be read")
+    finally:
+        shutdown_pool()
+        await close_mongodb_connection()
+
+if __name__ == "__main__":
+    asyncio.run(backfill_photo_placeholders())
@@ -0,0 +1,68 @@
+import asyncio
+import sys
+import os
+from datetime import datetime
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from app.db.mongodb import connect_to_mongodb, close_mongodb_connection, get_database
+from app.services.event_service import EventService
+from app.services.registration_service import RegistrationService
+from app.services.user_service import UserService
+
+async def migrate_registrations():
+    """
+    Move event participants arrays into the registrations collection.
+    Participants were stored as Firebase UIDs or user IDs; both are resolved to users.
+    Safe to run more than once.
+    """
+    await connect_to_mongodb()
+    try:
+        db = await get_database()
+        events = db[EventService.collection_name]
+        users = db[UserService.collection_name]
+        registrations = db[RegistrationService.collection_name]
+        
+        migrated_events = 0
+        async for event in events.find({"participants": {"$exists": True}}, {"participants": 1}):
+            event_id = str(event["_id"])
+            participants = event.get("participants") or []
+            
+            object_ids = [ObjectId(p) for p in participants if ObjectId.is_valid(p)]
+            query = {"$or": [{"firebase_uid": {"$in": participants}}, {"_id": {"$in": object_ids}}]}
+            operations = []
+            user_ids = []
+            async for user in users.find(query, {"firebase_uid": 1}):
+                user_ids.append(user["_id"])
+                operations.append(UpdateOne(
+                    {"event_id": event_id, "user_id": str(user["_id"])},
+                    {"$setOnInsert": {"firebase_uid": user.get("firebase_uid"), "created_at": datetime.utcnow()}},
+                    upsert=True
+                ))
+            
+            if operations:
+                await registrations.bulk_write(operations, ordered=False)
+                await users.update_many(
+                    {"_id": {"$in": user_ids}},
+                    {"$addToSet": {"registered_events": event_id}}
+                )
+            
+            unresolved = len(participants) - len(operations)
+            if unresolved:
+                print(f"Event {event_id}: {unresolved} participant(s) without a matching user were dropped")
+            
+            participant_count = await registrations.count_documents({"event_id": event_id})
+            await events.update_one(
+                {"_id": event["_id"]},
+                {"$set": {"participant_count": participant_count}, "$unset": {"participants": ""}}
+            )
+            migrated_events += 1
+        
+        print(f"Migrated registrations for {migrated_events} event(s)")
+    finally:
+        await close_mongodb_connection()
+
+if __name__ == "__main__":
+    asyncio.run(migrate_registrations())
@@ -0,0 +1,26 @@
+import asyncio
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from app.db.mongodb import connect_to_mongodb, close_mongodb_connection
+from app.services.leaderboard_service import LeaderboardService
+from app.services.rollup_service import RollupService
+
+async def rebuild_leaderboards(event_id: str = None):
+    """Recompute leaderboard totals and daily/weekly rollups from existing progress entries."""
+    await connect_to_mongodb()
+    try:
+        await LeaderboardService.rebuild(event_id)
+        await RollupService.rebuild(event_id)
+        print(f"Rebuilt leaderboard and rollups for {'event ' + event_id if event_id else 'all events'}")
+    finally:
+        await close_mongodb_connection()
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2:
+        print("Usage: python rebuild_leaderboards.py [event_id]")
+        sys.exit(1)
+    
+    asyncio.run(rebuild_leaderboards(sys.argv[1] if len(sys.argv) == 2 else None))
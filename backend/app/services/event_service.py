@@ -1,27 +1,55 @@
+import asyncio
 from datetime import datetime
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Tuple, Union
 from bson import ObjectId
 from fastapi import HTTPException, status
+from pymongo import ReturnDocument
+from app.core.pagination import keyset_filter, next_cursor, sort_spec
 from app.db.mongodb import get_database
-from app.models.event import EventCreate, EventUpdate, Event, EventInDB
+from app.models.event import EventCreate, EventUpdate, Event, EventInDB, EventSummary
+from app.services.leaderboard_service import LeaderboardService
+from app.services.registration_service import RegistrationService
+from app.services.rollup_service import RollupService
 
 class EventService:
     """Service for event operations."""
     
     collection_name = "events"
     
+    # Fields that can be requested with `fields=`, and the projection for `view=summary`
+    selectable_fields = set(Event.model_fields) - {"id"}
+    summary_projection = {field: 1 for field in EventSummary.model_fields if field not in ("id", "is_registered")}
+    
+    @classmethod
+    def get_projection(cls, view: str = "full", fields: Optional[List[str]] = None) -> Optional[Dict[str, int]]:
+        """Build the Mongo projection for a listing view, or None for full documents."""
+        if fields:
+            unknown = set(fields) - cls.selectable_fields
+            if unknown:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Unknown event fields: {', '.join(sorted(unknown))}"
+                )
+            # created_at is always kept as it is the pagination key
+            return {field: 1 for field in [*fields, "created_at"] if field != "is_registered"}
+        if view == "summary":
+            return cls.summary_projection
+        if view == "full":
+            return None
+        raise HTTPException(status_code=400, detail=f"Unknown event view: {view}")
+    
     @classmethod
     async def create_event(cls, event: EventCreate) -> Event:
         """Create a new event."""
         db = await get_database()
         event_dict = event.dict()
         event_dict["created_at"] = datetime.utcnow()
-        event_dict["participants"] = []
+        event_dict["participant_count"] = 0
         
         result = await db[cls.collection_name].insert_one(event_dict)
         
-        created_event = await db[cls.collection_name].find_one({"_id": result.inserted_id})
-        return Event(**created_event)
+        event_dict["_id"] = result.inserted_id
+        return Event(**event_dict)
     
     @classmethod
     async def get_event(cls, event_id: str) -> Optional[Event]:
@@ -36,14 +64,39 @@ class EventService:
         return None
     
     @classmethod
-    async def get_events(cls, skip: int = 0, limit: int = 100) -> List[Event]:
-        """Get all events with pagination."""
+    async def get_events(
+        cls,
+        skip: int = 0,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        view: str = "full",
+        fields: Optional[List[str]] = None
+    ) -> Tuple[List[Union[Event, EventSummary, Dict[str, Any]]], Optional[str]]:
+        """
+        Get all events with pagination, oldest first, and the cursor for the next page.
+        Pass the `cursor` of the previous page for keyset paging; `skip` is then ignored.
+        `view="summary"` returns EventSummary models; `fields` returns plain dicts
+        with just those fields. Either way only the needed fields are read from Mongo.
+        """
         db = await get_database()
-        events = []
-        cursor = db[cls.collection_name].find().skip(skip).limit(limit)
-        async for event in cursor:
-            events.append(Event(**event))
-        return events
+        projection = cls.get_projection(view, fields)
+        query = keyset_filter(cursor, "created_at", 1) if cursor else {}
+        results = db[cls.collection_name].find(query, projection).sort(sort_spec("created_at", 1))
+        if skip and not cursor:
+            results = results.skip(skip)
+        docs = await results.limit(limit).to_list(length=limit)
+        page_cursor = next_cursor(docs, limit, "created_at")
+        
+        if fields:
+            events = []
+            for doc in docs:
+                event = {field: doc[field] for field in fields if field in doc}
+                event["_id"] = str(doc["_id"])
+                events.append(event)
+            return events, page_cursor
+        if view == "summary":
+            return [EventSummary(**event) for event in docs], page_cursor
+        return [Event(**event) for event in docs], page_cursor
     
     @classmethod
     async def update_event(cls, event_id: str, event_update: EventUpdate) -> Optional[Event]:
@@ -59,15 +112,19 @@ class EventService:
             
         update_data["updated_at"] = datetime.utcnow()
         
-        result = await db[cls.collection_name].update_one(
+        updated_event = await db[cls.collection_name].find_one_and_update(
             {"_id": ObjectId(event_id)},
-            {"$set": update_data}
+            {"$set": update_data},
+            return_document=ReturnDocument.AFTER
         )
         
-        if result.modified_count == 0:
+        if not updated_event:
             return None
             
-        updated_event = await db[cls.collection_name].find_one({"_id": ObjectId(event_id)})
+        if "target_distance" in update_data:
+            # Changes whether the leaderboard ranks by distance or time
+            await LeaderboardService.invalidate_cache(event_id)
+            
         return Event(**updated_event)
     
     @classmethod
@@ -78,66 +135,10 @@ class EventService:
             raise HTTPException(status_code=400, detail="Invalid event ID format")
             
         result = await db[cls.collection_name].delete_one({"_id": ObjectId(event_id)})
+        if result.deleted_count > 0:
+            await asyncio.gather(
+                LeaderboardService.delete_event(event_id),
+                RollupService.delete_event(event_id),
+                RegistrationService.delete_event_registrations(event_id)
+            )
         return result.deleted_count > 0
-    
-    @classmethod
-    async def register_participant(cls, event_id: str, user_id: str) -> Optional[Event]:
-        """Register a participant for an event."""
-        db = await get_database()
-        if not ObjectId.is_valid(event_id):
-            raise HTTPException(status_code=400, detail="Invalid event ID format")
-            
-        # Check if event exists
-        event = await db[cls.collection_name].find_one({"_id": ObjectId(event_id)})
-        if not event:
-            return None
-            
-        # Check if user is already registered
-        if user_id in event.get("participants", []):
-            raise HTTPException(status_code=400, detail="User already registered for this event")
-            
-        # Add user to participants
-        result = await db[cls.collection_name].update_one(
-            {"_id": ObjectId(event_id)},
-            {"$addToSet": {"participants": user_id}}
-        )
-        
-        if result.modified_count == 0:
-            return None
-            
-        updated_event = await db[cls.collection_name].find_one({"_id": ObjectId(event_id)})
-        return Event(**updated_event)
-    
-    @classmethod
-    async def unregister_participant(cls, event_id: str, user_id: str) -> Optional[Event]:
-        """Unregister a participant from an event."""
-        db = await get_database()
-        if not ObjectId.is_valid(event_id):
-            raise HTTPException(status_code=400, detail="Invalid event ID format")
-            
-        # Check if event exists
-        event = await db[cls.collection_name].find_one({"_id": ObjectId(event_id)})
-        if not event:
-            return None
-            
-        # Remove user from participants
-        result = await db[cls.collection_name].update_one(
-            {"_id": ObjectId(event_id)},
-            {"$pull": {"participants": user_id}}
-        )
-        
-        if result.modified_count == 0:
-            return None
-            
-        updated_event = await db[cls.collection_name].find_one({"_id": ObjectId(event_id)})
-        return Event(**updated_event)
-    
-    @classmethod
-    async def get_user_events(cls, user_id: str) -> List[Event]:
-        """Get all events a user is registered for."""
-        db = await get_database()
-        events = []
-        cursor = db[cls.collection_name].find({"participants": user_id})
-        async for event in cursor:
-            events.append(Event(**event))
-        return events 
\ No newline at end of file
@@ -0,0 +1,74 @@
+import hashlib
+import json
+from datetime import datetime
+from typing import Any, Dict, Optional
+from fastapi import HTTPException, status
+from pymongo.errors import DuplicateKeyError
+from app.db.mongodb import get_database
+
+class IdempotencyService:
+    """
+    Service for Idempotency-Key handling.
+    The first request with a key claims it by inserting a record (unique per
+    user, scope and key); once it succeeds the response is stored on the record
+    and replayed for retries. Records expire through a TTL index.
+    """
+    
+    collection_name = "idempotency_keys"
+    
+    @staticmethod
+    def request_hash(payload: Dict[str, Any]) -> str:
+        """Fingerprint a request body, to catch a key being reused for a different request."""
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+    
+    @classmethod
+    async def begin(cls, scope: str, user_id: str, key: str, request_hash: str) -> Optional[Dict[str, Any]]:
+        """
+        Claim an idempotency key.
+        Returns None when the request should go ahead, or the stored response of
+        the original request when this is a replay.
+        """
+        db = await get_database()
+        try:
+            await db[cls.collection_name].insert_one({
+                "scope": scope,
+                "user_id": user_id,
+                "key": key,
+                "request_hash": request_hash,
+                "status": "pending",
+                "created_at": datetime.utcnow()
+            })
+            return None
+        except DuplicateKeyError:
+            pass
+        
+        record = await db[cls.collection_name].find_one({"scope": scope, "user_id": user_id, "key": key})
+        if not record:
+            # Expired between the insert and the read; treat it as a new request
+            return await cls.begin(scope, user_id, key, request_hash)
+        if record["request_hash"] != request_hash:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Idempotency-Key was already used for a different request"
+            )
+        if record["status"] != "completed":
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A request with this Idempotency-Key is still being processed"
+            )
+        return record["response"]
+    
+    @classmethod
+    async def complete(cls, scope: str, user_id: str, key: str, response: Dict[str, Any]) -> None:
+        """Store the response of a successful request for replays."""
+        db = await get_database()
+        await db[cls.collection_name].update_one(
+            {"scope": scope, "user_id": user_id, "key": key},
+            {"$set": {"status": "completed", "response": response, "completed_at": datetime.utcnow()}}
+        )
+    
+    @classmethod
+    async def release(cls, scope: str, user_id: str, key: str) -> None:
+        """Give up a key after a failed request, so the client can retry with it."""
+        db = await get_database()
+        await db[cls.collection_name].delete_one({"scope": scope, "user_id": user_id, "key": key, "status": "pending"})
@@ -0,0 +1,161 @@
+"""
+Image processing for uploaded photos.
+
+Pillow work is CPU-bound, so it runs in a process pool and never on the
+event loop. Each upload gets resized variants at the configured widths and
+formats, with EXIF orientation applied and metadata stripped, plus what a
+gallery needs to lay it out before loading it: dimensions, dominant colour
+and a tiny inline placeholder image.
+"""
+import asyncio
+import base64
+import io
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+from PIL import Image, ImageOps
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Pillow format name and file extension per variant format
+VARIANT_FORMATS = {
+    "webp": ("WEBP", "webp"),
+    "jpeg": ("JPEG", "jpg"),
+}
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=settings.PHOTO_PROCESS_WORKERS)
+    return _pool
+
+def variant_widths() -> List[int]:
+    return [int(width) for width in settings.PHOTO_VARIANT_WIDTHS.split(",") if width.strip()]
+
+def variant_formats() -> List[str]:
+    return [fmt.strip().lower() for fmt in settings.PHOTO_VARIANT_FORMATS.split(",") if fmt.strip()]
+
+def shutdown_pool() -> None:
+    """Stop the worker processes, at application shutdown."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+def _flatten(image: Image.Image) -> Image.Image:
+    """Drop the alpha channel of an image, onto white."""
+    if image.mode != "RGBA":
+        return image
+    flat = Image.new("RGB", image.size, (255, 255, 255))
+    flat.paste(image, mask=image.getchannel("A"))
+    return flat
+
+def dominant_color(image: Image.Image) -> str:
+    """The most common colour of an image, as #rrggbb."""
+    # resize() returns a new image; thumbnail() would shrink the caller's in place
+    small = _flatten(image)
+    small = small.resize((min(64, small.width), min(64, small.height)), Image.Resampling.BOX)
+    quantized = small.quantize(colors=8)
+    _, index = max(quantized.getcolors())
+    red, green, blue = quantized.getpalette()[index * 3:index * 3 + 3]
+    return f"#{red:02x}{green:02x}{blue:02x}"
+
+def placeholder(image: Image.Image, variant_format: str) -> str:
+    """A few-hundred-byte, heavily downscaled copy of an image as a data URI, to blur up while loading."""
+    pil_format, _ = VARIANT_FORMATS[variant_format]
+    width = min(settings.PHOTO_PLACEHOLDER_WIDTH, image.width)
+    height = max(1, round(image.height * width / image.width))
+    tiny = image.resize((width, height), Image.Resampling.BOX)
+    if pil_format == "JPEG":
+        tiny = _flatten(tiny)
+    buffer = io.BytesIO()
+    tiny.save(buffer, pil_format, quality=50)
+    return f"data:image/{variant_format};base64,{base64.b64encode(buffer.getvalue()).decode()}"
+
+def _open_oriented(source_path: str) -> Image.Image:
+    """Open an image upright, as RGB or RGBA."""
+    with Image.open(source_path) as image:
+        image = ImageOps.exif_transpose(image)
+        has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+        return image.convert("RGBA" if has_alpha else "RGB")
+
+def describe_image(source_path: str, placeholder_format: str) -> Dict[str, Any]:
+    """Dimensions, dominant colour and placeholder of an image. Runs in a worker process."""
+    image = _open_oriented(source_path)
+    return {
+        "width": image.width,
+        "height": image.height,
+        "dominant_color": dominant_color(image),
+        "placeholder": placeholder(image, placeholder_format),
+    }
+
+def generate_variants(
+    source_path: str,
+    output_dir: str,
+    basename: str,
+    widths: List[int],
+    formats: List[str]
+) -> Dict[str, Any]:
+    """
+    Write resized copies of an image and return them with its dimensions,
+    dominant colour and placeholder.
+    Runs in a worker process. Variants are never wider than the original;
+    metadata isn't carried over, so EXIF (including location) is stripped.
+    """
+    image = _open_oriented(source_path)
+    width, height = image.size
+    
+    os.makedirs(output_dir, exist_ok=True)
+    variants = []
+    # Widths wider than the original collapse into one full-size variant
+    for variant_width in sorted({min(w, width) for w in widths}):
+        variant_height = max(1, round(height * variant_width / width))
+        resized = image if variant_width == width else image.resize(
+            (variant_width, variant_height), Image.Resampling.LANCZOS
+        )
+        for variant_format in formats:
+            pil_format, extension = VARIANT_FORMATS[variant_format]
+            filename = f"{basename}-{variant_width}.{extension}"
+            path = os.path.join(output_dir, filename)
+            if pil_format == "JPEG":
+                # JPEG has no alpha channel, flatten onto white
+                _flatten(resized).save(path, pil_format, quality=settings.PHOTO_JPEG_QUALITY, optimize=True, progressive=True)
+            else:
+                resized.save(path, pil_format, quality=settings.PHOTO_WEBP_QUALITY, method=4)
+            variants.append({
+                "filename": filename,
+                "width": variant_width,
+                "height": variant_height,
+                "format": variant_format,
+                "size": os.path.getsize(path)
+            })
+    
+    return {
+        "width": width,
+        "height": height,
+        "dominant_color": dominant_color(image),
+        "placeholder": placeholder(image, formats[0]),
+        "variants": variants
+    }
+
+async def process_image(source_path: str, output_dir: str, basename: str) -> Dict[str, Any]:
+    """Generate the configured variants of an image in the process pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_pool(),
+        generate_variants,
+        source_path,
+        output_dir,
+        basename,
+        variant_widths(),
+        variant_formats()
+    )
+
+async def process_image_summary(source_path: str) -> Dict[str, Any]:
+    """Describe an image for the gallery, without generating variants, in the process pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_pool(), describe_image, source_path, variant_formats()[0])
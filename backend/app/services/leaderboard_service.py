@@ -0,0 +1,337 @@
+import asyncio
+from datetime import datetime
+from typing import List, Optional, Dict, Any
+from bson import ObjectId
+from fastapi import HTTPException
+from app.core.cache import ResponseCache, cache_backend
+from app.core.config import settings
+from app.db.mongodb import get_database
+
+class LeaderboardService:
+    """
+    Service for event leaderboards.
+    Each (event, user) pair has one document holding running totals that
+    are adjusted with $inc whenever a progress entry is created, updated or
+    deleted, so reading a leaderboard never re-aggregates progress history.
+    """
+    
+    collection_name = "leaderboard"
+    
+    # Leaderboard pages, dropped whenever the event's totals change
+    cache = ResponseCache(
+        cache_backend,
+        ttl=settings.LEADERBOARD_CACHE_TTL,
+        soft_ttl=settings.LEADERBOARD_CACHE_SOFT_TTL or None
+    )
+    
+    @staticmethod
+    def _cache_namespace(event_id: str) -> str:
+        return f"leaderboard:{event_id}"
+    
+    @classmethod
+    async def invalidate_cache(cls, event_id: str) -> None:
+        """Drop the cached leaderboard pages of an event."""
+        await cls.cache.invalidate(cls._cache_namespace(event_id))
+    
+    @staticmethod
+    def _sort_field(target_distance: Optional[float]) -> str:
+        # Distance events rank by distance covered, the rest by time spent
+        return "total_distance" if target_distance else "total_time"
+    
+    @classmethod
+    def _sort_spec(cls, sort_field: str) -> List[tuple]:
+        return [(sort_field, -1), ("last_update", 1), ("user_id", 1)]
+    
+    @classmethod
+    async def get_sort_field(cls, event_id: str) -> str:
+        """Get the field an event's leaderboard is ranked by."""
+        db = await get_database()
+        if not ObjectId.is_valid(event_id):
+            raise HTTPException(status_code=400, detail="Invalid event ID format")
+            
+        event = await db["events"].find_one({"_id": ObjectId(event_id)}, {"target_distance": 1})
+        if not event:
+            raise HTTPException(status_code=404, detail="Event not found")
+        return cls._sort_field(event.get("target_distance"))
+    
+    @classmethod
+    async def _apply(
+        cls,
+        event_id: str,
+        user_id: str,
+        distance: float = 0,
+        time: float = 0,
+        entries: int = 0,
+        last_update: Optional[datetime] = None
+    ) -> None:
+        db = await get_database()
+        key = {"event_id": event_id, "user_id": user_id}
+        update: Dict[str, Any] = {
+            "$inc": {"total_distance": distance, "total_time": time, "entries": entries}
+        }
+        if last_update:
+            update["$max"] = {"last_update": last_update}
+        # Only a new entry may create the row; adjustments to a missing row wait for a rebuild
+        await db[cls.collection_name].update_one(key, update, upsert=entries > 0)
+        
+        if entries < 0:
+            # The user's last entry for this event is gone, drop them from the board
+            await db[cls.collection_name].delete_one({**key, "entries": {"$lte": 0}})
+        await cls.invalidate_cache(event_id)
+    
+    @classmethod
+    async def record_progress(cls, progress: Dict[str, Any]) -> None:
+        """Add a newly created progress entry to the totals."""
+        await cls._apply(
+            progress["event_id"],
+            progress["user_id"],
+            distance=progress.get("distance") or 0,
+            time=progress.get("time") or 0,
+            entries=1,
+            last_update=progress.get("created_at")
+        )
+    
+    @classmethod
+    async def record_progress_many(cls, progress_entries: List[Dict[str, Any]]) -> None:
+        """Add a batch of new progress entries, with one update per (event, user)."""
+        totals: Dict[tuple, Dict[str, Any]] = {}
+        for progress in progress_entries:
+            key = (progress["event_id"], progress["user_id"])
+            total = totals.setdefault(key, {"distance": 0, "time": 0, "entries": 0, "last_update": None})
+            total["distance"] += progress.get("distance") or 0
+            total["time"] += progress.get("time") or 0
+            total["entries"] += 1
+            created_at = progress.get("created_at")
+            if created_at and (total["last_update"] is None or created_at > total["last_update"]):
+                total["last_update"] = created_at
+        
+        await asyncio.gather(*(
+            cls._apply(event_id, user_id, **total)
+            for (event_id, user_id), total in totals.items()
+        ))
+    
+    @classmethod
+    async def update_progress(cls, before: Dict[str, Any], after: Dict[str, Any]) -> None:
+        """Apply the difference between two versions of a progress entry."""
+        distance = (after.get("distance") or 0) - (before.get("distance") or 0)
+        time = (after.get("time") or 0) - (before.get("time") or 0)
+        if distance or time:
+            await cls._apply(before["event_id"], before["user_id"], distance=distance, time=time)
+    
+    @classmethod
+    async def remove_progress(cls, progress: Dict[str, Any]) -> None:
+        """Subtract a deleted progress entry from the totals."""
+        await cls._apply(
+            progress["event_id"],
+            progress["user_id"],
+            distance=-(progress.get("distance") or 0),
+            time=-(progress.get("time") or 0),
+            entries=-1
+        )
+    
+    @classmethod
+    async def get_leaderboard(
+        cls,
+        event_id: str,
+        limit: int = 0,
+        after_rank: int = 0,
+        after_user_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Get the ranked leaderboard for an event.
+        To page, pass the user_id and rank of the last entry of the previous page
+        as `after_user_id` and `after_rank`; the next `limit` entries are read by
+        seeking the ranking index from that entry, so deep pages cost no more
+        than the first. Results are cached until the event's totals change.
+        """
+        if not ObjectId.is_valid(event_id):
+            raise HTTPException(status_code=400, detail="Invalid event ID format")
+        if after_rank and not after_user_id:
+            raise HTTPException(status_code=400, detail="after_rank requires after_user_id")
+            
+        return await cls.cache.get_or_load(
+            cls._cache_namespace(event_id),
+            f"{limit}:{after_rank}:{after_user_id or ''}",
+            lambda: cls._read_leaderboard(event_id, limit, after_rank, after_user_id)
+        )
+    
+    @classmethod
+    async def _read_leaderboard(
+        cls,
+        event_id: str,
+        limit: int,
+        after_rank: int,
+        after_user_id: Optional[str]
+    ) -> List[Dict[str, Any]]:
+        db = await get_database()
+        sort_field = await cls.get_sort_field(event_id)
+        collection = db[cls.collection_name]
+        
+        query: Dict[str, Any] = {"event_id": event_id}
+        rank = 1
+        if after_user_id:
+            boundary = await collection.find_one({"event_id": event_id, "user_id": after_user_id})
+            if not boundary:
+                raise HTTPException(status_code=400, detail="after_user_id is not on this leaderboard")
+            query = cls._behind(boundary, sort_field)
+            # Without the boundary's rank from the previous page, count it once
+            boundary_rank = after_rank or await cls._rank_of(collection, boundary, sort_field)
+            rank = boundary_rank + 1 if boundary_rank else None
+        
+        cursor = collection.find(query).sort(cls._sort_spec(sort_field))
+        if limit:
+            cursor = cursor.limit(limit)
+            
+        leaderboard = []
+        async for entry in cursor:
+            leaderboard.append(cls._serialize(entry, rank))
+            if rank is not None:
+                rank += 1
+        return leaderboard
+    
+    @classmethod
+    async def _rank_of(cls, collection, entry: Dict[str, Any], sort_field: str) -> Optional[int]:
+        """
+        Rank of a leaderboard entry, counted on the ranking index.
+        Counting walks every entry ranked above, so it costs O(rank); it stops
+        at LEADERBOARD_RANK_LIMIT and returns None for entries ranked deeper.
+        """
+        ahead = await collection.count_documents(
+            cls._ahead_of(entry, sort_field),
+            limit=settings.LEADERBOARD_RANK_LIMIT
+        )
+        if ahead >= settings.LEADERBOARD_RANK_LIMIT:
+            return None
+        return ahead + 1
+    
+    @classmethod
+    def _ahead_of(cls, entry: Dict[str, Any], sort_field: str) -> Dict[str, Any]:
+        """Query matching the leaderboard entries ranked above `entry`."""
+        score = entry.get(sort_field, 0)
+        last_update = entry.get("last_update")
+        return {
+            "event_id": entry["event_id"],
+            "$or": [
+                {sort_field: {"$gt": score}},
+                {sort_field: score, "last_update": {"$lt": last_update}},
+                {sort_field: score, "last_update": last_update, "user_id": {"$lt": entry["user_id"]}},
+            ]
+        }
+    
+    @classmethod
+    def _behind(cls, entry: Dict[str, Any], sort_field: str) -> Dict[str, Any]:
+        """Query matching the leaderboard entries ranked below `entry`."""
+        score = entry.get(sort_field, 0)
+        last_update = entry.get("last_update")
+        return {
+            "event_id": entry["event_id"],
+            "$or": [
+                {sort_field: {"$lt": score}},
+                {sort_field: score, "last_update": {"$gt": last_update}},
+                {sort_field: score, "last_update": last_update, "user_id": {"$gt": entry["user_id"]}},
+            ]
+        }
+    
+    @classmethod
+    async def get_user_window(cls, event_id: str, user_id: str, neighbours: int = 5) -> Dict[str, Any]:
+        """
+        Get a user's rank together with up to `neighbours` entries ranked
+        directly above and below them. Ranks deeper than LEADERBOARD_RANK_LIMIT
+        are not counted and come back as None.
+        """
+        db = await get_database()
+        sort_field = await cls.get_sort_field(event_id)
+        collection = db[cls.collection_name]
+        
+        entry = await collection.find_one({"event_id": event_id, "user_id": user_id})
+        if not entry:
+            return {"rank": None, "entries": []}
+            
+        rank = await cls._rank_of(collection, entry, sort_field)
+        
+        # Walk the ranking index outwards from the user in both directions
+        reverse_spec = [(field, -direction) for field, direction in cls._sort_spec(sort_field)]
+        above = []
+        if neighbours:
+            cursor = collection.find(cls._ahead_of(entry, sort_field)).sort(reverse_spec).limit(neighbours)
+            above = [doc async for doc in cursor]
+            above.reverse()
+            
+        below = []
+        if neighbours:
+            cursor = collection.find(cls._behind(entry, sort_field)).sort(cls._sort_spec(sort_field)).limit(neighbours)
+            below = [doc async for doc in cursor]
+            
+        # Beyond the rank limit the window is still returned, unnumbered
+        first_rank = rank - len(above) if rank else None
+        window = above + [entry] + below
+        return {
+            "rank": rank,
+            "entries": [
+                cls._serialize(doc, first_rank + i if first_rank else None)
+                for i, doc in enumerate(window)
+            ]
+        }
+    
+    @classmethod
+    async def get_user_totals(cls, user_id: str, event_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get a user's running totals, for every event they have progress in or just one."""
+        db = await get_database()
+        query = {"user_id": user_id}
+        if event_id:
+            query["event_id"] = event_id
+        return await db[cls.collection_name].find(query, {"_id": 0}).to_list(length=None)
+    
+    @classmethod
+    async def delete_event(cls, event_id: str) -> None:
+        """Remove an event's leaderboard."""
+        db = await get_database()
+        await db[cls.collection_name].delete_many({"event_id": event_id})
+        await cls.invalidate_cache(event_id)
+    
+    @classmethod
+    async def rebuild(cls, event_id: Optional[str] = None) -> None:
+        """Recompute leaderboard totals from the progress collection, for one event or all of them."""
+        db = await get_database()
+        match = {"event_id": event_id} if event_id else {}
+        
+        await db[cls.collection_name].delete_many(match)
+        pipeline = [
+            {"$match": match},
+            {"$group": {
+                "_id": {"event_id": "$event_id", "user_id": "$user_id"},
+                "total_distance": {"$sum": "$distance"},
+                "total_time": {"$sum": "$time"},
+                "entries": {"$sum": 1},
+                "last_update": {"$max": "$created_at"}
+            }},
+            {"$project": {
+                "_id": 0,
+                "event_id": "$_id.event_id",
+                "user_id": "$_id.user_id",
+                "total_distance": 1,
+                "total_time": 1,
+                "entries": 1,
+                "last_update": 1
+            }},
+            {"$merge": {
+                "into": cls.collection_name,
+                "on": ["event_id", "user_id"],
+                "whenMatched": "replace",
+                "whenNotMatched": "insert"
+            }},
+        ]
+        async for _ in db["progress"].aggregate(pipeline):
+            pass
+        if event_id:
+            await cls.invalidate_cache(event_id)
+    
+    @staticmethod
+    def _serialize(entry: Dict[str, Any], rank: Optional[int]) -> Dict[str, Any]:
+        return {
+            "rank": rank,
+            "user_id": entry["user_id"],
+            "total_distance": entry.get("total_distance", 0),
+            "total_time": entry.get("total_time", 0),
+            "last_update": entry.get("last_update")
+        }
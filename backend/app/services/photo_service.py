@@ -1,18 +1,37 @@
 from datetime import datetime
-from typing import List, Optional, Dict
+from typing import Any, List, Optional, Dict, Tuple
 from bson import ObjectId
 from fastapi import HTTPException, status
 import logging
-from app.db.mongodb import get_database, photos_collection
-from app.models.photo import PhotoCreate, PhotoUpdate, Photo, PhotoInDB
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.jobs import PermanentJobError, job_queue
+from app.core.pagination import keyset_filter, next_cursor, sort_spec
+from app.db.mongodb import get_database
+from app.models.photo import PhotoCreate, PhotoUpdate, Photo, PhotoInDB, PhotoGalleryItem
+from app.services.photo_storage import InvalidImageError, PhotoStorage
 
 logger = logging.getLogger(__name__)
 
+# Background job generating an uploaded photo's variants
+PHOTO_PROCESS_JOB = "photo.process"
+
 class PhotoService:
     """Service for photo operations."""
     
     collection_name = "photos"
     
+    # Total number of photos, so listing pages don't count the collection each time.
+    # Dropped whenever this worker adds or removes a photo; other workers' changes show up after the TTL.
+    _count_cache = TTLCache(max_size=1, ttl=settings.PHOTO_COUNT_CACHE_TTL)
+    
+    # Fields read for the gallery grid
+    gallery_projection = {
+        "title": 1, "description": 1, "photo_date": 1, "width": 1, "height": 1,
+        "dominant_color": 1, "placeholder": 1, "variants": 1, "image_url": 1, "thumbnail_url": 1,
+        "status": 1,
+    }
+    
     @staticmethod
     async def create_photo(photo_data: PhotoCreate) -> Photo:
         """Create a new photo."""
@@ -46,6 +65,7 @@ class PhotoService:
                 )
             
             logger.info(f"Photo created with ID: {result.inserted_id}")
+            PhotoService._count_cache.clear()
             
             # Create a Photo model for the API response
             return Photo(
@@ -56,8 +76,17 @@ class PhotoService:
                 photo_date=photo_data.photo_date,
                 created_by=photo_data.created_by,
                 created_at=current_time,
+                width=photo_data.width,
+                height=photo_data.height,
+                dominant_color=photo_data.dominant_color,
+                placeholder=photo_data.placeholder,
+                variants=photo_data.variants,
+                content_key=photo_data.content_key,
+                content_type=photo_data.content_type,
+                size=photo_data.size,
+                status=photo_data.status,
                 photo_url=photo_data.image_url,
-                thumbnail_url=photo_data.image_url
+                thumbnail_url=photo_data.thumbnail_url or photo_data.image_url
             )
             
         except Exception as e:
@@ -68,30 +97,52 @@ class PhotoService:
             )
     
     @staticmethod
-    async def get_photos(skip: int = 0, limit: int = 10, sort_by: str = "-created_at") -> List[Photo]:
+    async def _find_page(
+        skip: int,
+        limit: int,
+        sort_by: str,
+        cursor: Optional[str],
+        projection: Optional[Dict[str, int]] = None
+    ) -> Tuple[List[dict], Optional[str]]:
+        """Read one page of photo documents, and the cursor for the next page."""
+        db = await get_database()
+        
+        # Determine sort order
+        sort_order = 1
+        if sort_by.startswith("-"):
+            sort_order = -1
+            sort_by = sort_by[1:]
+        
+        if projection is not None:
+            # The cursor is built from the sort field
+            projection = {**projection, sort_by: 1}
+        
+        collection = db[PhotoService.collection_name]
+        query = keyset_filter(cursor, sort_by, sort_order) if cursor else {}
+        results = collection.find(query, projection).sort(sort_spec(sort_by, sort_order))
+        if skip and not cursor:
+            results = results.skip(skip)
+        
+        docs = await results.limit(limit).to_list(length=limit)
+        return docs, next_cursor(docs, limit, sort_by)
+    
+    @staticmethod
+    async def get_photos(
+        skip: int = 0,
+        limit: int = 10,
+        sort_by: str = "-created_at",
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Photo], Optional[str]]:
         """
-        Get a list of photos with pagination.
+        Get a list of photos with pagination, and the cursor for the next page.
         Sort by: -created_at (newest first), photo_date, title
+        Pass the `cursor` of the previous page for keyset paging; `skip` is then ignored.
         """
         try:
-            db = await get_database()
-            
-            # Determine sort order
-            sort_order = 1
-            if sort_by.startswith("-"):
-                sort_order = -1
-                sort_by = sort_by[1:]
-                
-            collection = db[PhotoService.collection_name]
-            cursor = collection.find().sort(
-                sort_by, sort_order
-            ).skip(skip).limit(limit)
-            
-            photos = []
-            async for doc in cursor:
-                photos.append(Photo(**doc))
-                
-            return photos
+            docs, page_cursor = await PhotoService._find_page(skip, limit, sort_by, cursor)
+            return [Photo(**doc) for doc in docs], page_cursor
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Error in get_photos: {str(e)}")
             raise HTTPException(
@@ -99,6 +150,30 @@ class PhotoService:
                 detail=f"Failed to retrieve photos: {str(e)}",
             )
     
+    @staticmethod
+    async def get_gallery(
+        limit: int = 24,
+        sort_by: str = "-created_at",
+        cursor: Optional[str] = None
+    ) -> Tuple[List[PhotoGalleryItem], Optional[str]]:
+        """
+        Get a page of the gallery: only the fields needed to lay out the grid and
+        paint placeholders, and the cursor for the next page.
+        """
+        try:
+            docs, page_cursor = await PhotoService._find_page(
+                0, limit, sort_by, cursor, PhotoService.gallery_projection
+            )
+            return [PhotoGalleryItem(**doc) for doc in docs], page_cursor
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Error in get_gallery: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to retrieve gallery: {str(e)}",
+            )
+    
     @staticmethod
     async def get_photo(photo_id: str) -> Optional[Photo]:
         """Get a photo by ID."""
@@ -210,6 +285,8 @@ class PhotoService:
                 result = await collection.delete_one({"_id": photo_id})
                 
             deleted = result.deleted_count > 0
+            if deleted:
+                PhotoService._count_cache.clear()
             logger.info(f"Photo deletion result: {deleted} (deleted_count: {result.deleted_count})")
             return deleted
         except Exception as e:
@@ -221,16 +298,115 @@ class PhotoService:
                 detail=f"Failed to delete photo: {str(e)}",
             )
     
+    @staticmethod
+    async def get_photo_by_content_key(content_key: str) -> Optional[Photo]:
+        """Get a processed photo stored with the given content key, to reuse its files and variants."""
+        db = await get_database()
+        photo_data = await db[PhotoService.collection_name].find_one(
+            {"content_key": content_key, "status": {"$in": ["ready", None]}}
+        )
+        return Photo(**photo_data) if photo_data else None
+    
+    @staticmethod
+    async def release_content(content_key: Optional[str], urls: List[Optional[str]]) -> bool:
+        """
+        Remove stored files once no photo references their content any more.
+        Content-addressed files are shared by every photo with the same key,
+        so they are only removed when the last of those photos is gone.
+        Returns whether the files were removed.
+        """
+        if content_key:
+            db = await get_database()
+            references = await db[PhotoService.collection_name].count_documents(
+                {"content_key": content_key}, limit=1
+            )
+            if references:
+                logger.info(f"Keeping files of {content_key}, still referenced by other photos")
+                return False
+        
+        await PhotoStorage.delete_files(urls)
+        return True
+    
+    @staticmethod
+    async def release_files(photo: Photo) -> bool:
+        """Remove a deleted photo's original and variants, unless other photos share them."""
+        return await PhotoService.release_content(
+            photo.content_key,
+            [photo.image_url, *(variant.url for variant in photo.variants)]
+        )
+    
+    @staticmethod
+    def _id_filter(photo_id: str) -> Dict[str, Any]:
+        """Match a photo by ID; photos are stored with either ObjectId or string IDs."""
+        return {"_id": {"$in": [ObjectId(photo_id), photo_id]}}
+    
+    @staticmethod
+    async def process_photo(payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Job handler: generate an uploaded photo's variants and gallery data, then mark it ready."""
+        db = await get_database()
+        collection = db[PhotoService.collection_name]
+        photo = await collection.find_one(
+            PhotoService._id_filter(payload["photo_id"]),
+            {"image_url": 1, "content_key": 1, "status": 1}
+        )
+        if not photo or photo.get("status") != "processing":
+            # Deleted, or already processed by an earlier attempt
+            return {"skipped": True}
+        
+        name = PhotoStorage.name_for_url(photo["image_url"])
+        try:
+            async with PhotoStorage.local_copy(name) as source_path:
+                media = await PhotoStorage.create_variants(photo["content_key"], source_path)
+        except InvalidImageError as e:
+            raise PermanentJobError(str(e))
+        
+        variants = media.pop("variants")
+        result = await collection.update_one(
+            {"_id": photo["_id"], "status": "processing"},
+            {"$set": {
+                **media,
+                "variants": [variant.model_dump() for variant in variants],
+                "status": "ready",
+                "updated_at": datetime.utcnow()
+            }}
+        )
+        if result.matched_count == 0:
+            # Deleted while processing; drop the variants unless other photos share them
+            await PhotoService.release_content(photo["content_key"], [variant.url for variant in variants])
+            return {"skipped": True}
+        return {"photo_id": payload["photo_id"], "variants": len(variants)}
+    
+    @staticmethod
+    async def mark_processing_failed(job: Dict[str, Any], error: str) -> None:
+        """Job failure handler: flag the photo, which then only has its original."""
+        db = await get_database()
+        await db[PhotoService.collection_name].update_one(
+            {**PhotoService._id_filter(job["payload"]["photo_id"]), "status": "processing"},
+            {"$set": {"status": "failed", "processing_error": error, "updated_at": datetime.utcnow()}}
+        )
+    
     @staticmethod
     async def count_photos() -> int:
-        """Get the total count of photos."""
+        """Get the total count of photos, cached briefly."""
+        total = PhotoService._count_cache.get("total")
+        if total is not None:
+            return total
         try:
             db = await get_database()
             collection = db[PhotoService.collection_name]
-            return await collection.count_documents({})
+            total = await collection.count_documents({})
         except Exception as e:
             logger.error(f"Error in count_photos: {str(e)}")
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Failed to count photos: {str(e)}",
-            ) 
\ No newline at end of file
+            )
+        PhotoService._count_cache.set("total", total)
+        return total
+
+job_queue.register(
+    PHOTO_PROCESS_JOB,
+    PhotoService.process_photo,
+    concurrency=settings.PHOTO_PROCESS_WORKERS,
+    on_failure=PhotoService.mark_processing_failed
+)
@@ -0,0 +1,251 @@
+"""
+Content-addressed storage for photo files.
+
+Uploads are streamed in chunks to a temporary file while being hashed, then
+stored in the configured storage backend under a name derived from their
+SHA-256, sharded by the first two byte pairs (ab/cd/abcd....jpg). Identical
+uploads therefore share one object; the photos referencing it act as its
+reference count.
+
+Photos keep the canonical URL of their objects (/uploads/photos/<name>),
+which is turned into a fetchable URL for the active backend on read.
+"""
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import aiofiles
+from fastapi import HTTPException, UploadFile, status
+from PIL import Image, UnidentifiedImageError
+from app.core.config import settings
+from app.core.storage import storage_backend
+from app.models.photo import PhotoVariant
+from app.services.image_processing import process_image, variant_formats
+
+logger = logging.getLogger(__name__)
+
+# Leading bytes of the image types we accept, with their content type and extension
+IMAGE_SIGNATURES: List[Tuple[bytes, int, str, str]] = [
+    (b"\xff\xd8\xff", 0, "image/jpeg", "jpg"),
+    (b"\x89PNG\r\n\x1a\n", 0, "image/png", "png"),
+    (b"GIF87a", 0, "image/gif", "gif"),
+    (b"GIF89a", 0, "image/gif", "gif"),
+    (b"WEBP", 8, "image/webp", "webp"),  # after "RIFF" and the chunk size
+]
+
+class InvalidImageError(Exception):
+    """A stored file that turned out not to be a readable image."""
+
+def sniff_image_type(header: bytes) -> Optional[Tuple[str, str]]:
+    """Detect the image type from a file's first bytes, as (content type, extension)."""
+    for signature, offset, content_type, extension in IMAGE_SIGNATURES:
+        if header[offset:offset + len(signature)] == signature:
+            if extension == "webp" and not header.startswith(b"RIFF"):
+                continue
+            return content_type, extension
+    return None
+
+class PhotoStorage:
+    """Storage for uploaded photos and their variants."""
+    
+    backend = storage_backend
+    url_prefix = settings.STORAGE_LOCAL_URL_PREFIX
+    temp_dir = "uploads/tmp"
+    
+    @staticmethod
+    def shard(key: str) -> str:
+        return f"{key[:2]}/{key[2:4]}"
+    
+    @classmethod
+    def object_name(cls, key: str, extension: str) -> str:
+        """Name of a stored original in the storage backend."""
+        return f"{cls.shard(key)}/{key}.{extension}"
+    
+    @classmethod
+    def url_for(cls, name: str) -> str:
+        return f"{cls.url_prefix}/{name}"
+    
+    @classmethod
+    def name_for_url(cls, url: Optional[str]) -> Optional[str]:
+        """Map a stored photo or variant URL back to its object name, or None if it isn't one of ours."""
+        if not url:
+            return None
+        if "://" in url:
+            from urllib.parse import urlparse
+            url = urlparse(url).path
+        if not url.startswith(cls.url_prefix + "/"):
+            return None
+        name = os.path.normpath(url[len(cls.url_prefix) + 1:]).replace(os.sep, "/")
+        if name.startswith(".."):
+            return None
+        return name
+    
+    @classmethod
+    def public_url(cls, url: Optional[str], base_url: str) -> Optional[str]:
+        """Turn a stored URL into one clients can fetch, e.g. pre-signed for S3."""
+        name = cls.name_for_url(url)
+        if name is not None:
+            return cls.backend.url(name, base_url)
+        if not url or url.startswith(("http://", "https://")):
+            return url
+        return f"{base_url.rstrip('/')}/{url.lstrip('/')}"
+    
+    @classmethod
+    async def receive(cls, upload: UploadFile) -> Dict[str, Any]:
+        """
+        Stream an upload to a temporary file, hashing it as it is written.
+        Only one chunk is held in memory at a time. Rejects files over
+        PHOTO_MAX_UPLOAD_SIZE and files whose content isn't a supported image.
+        """
+        os.makedirs(cls.temp_dir, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=cls.temp_dir, suffix=".upload")
+        os.close(fd)
+        
+        digest = hashlib.sha256()
+        size = 0
+        image_type = None
+        try:
+            async with aiofiles.open(temp_path, "wb") as out_file:
+                while True:
+                    chunk = await upload.read(settings.PHOTO_UPLOAD_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    if size == 0:
+                        image_type = sniff_image_type(chunk)
+                        if not image_type:
+                            raise HTTPException(
+                                status_code=status.HTTP_400_BAD_REQUEST,
+                                detail="File must be a JPEG, PNG, GIF or WebP image",
+                            )
+                    size += len(chunk)
+                    if size > settings.PHOTO_MAX_UPLOAD_SIZE:
+                        raise HTTPException(
+                            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=f"File is larger than {settings.PHOTO_MAX_UPLOAD_SIZE} bytes",
+                        )
+                    digest.update(chunk)
+                    await out_file.write(chunk)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        
+        if size == 0:
+            os.remove(temp_path)
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="File is empty")
+        
+        key = digest.hexdigest()
+        content_type, extension = image_type
+        name = cls.object_name(key, extension)
+        return {
+            "key": key,
+            "content_type": content_type,
+            "extension": extension,
+            "size": size,
+            "name": name,
+            "url": cls.url_for(name),
+            "temp_path": temp_path
+        }
+    
+    @classmethod
+    async def exists(cls, stored: Dict[str, Any]) -> bool:
+        return await cls.backend.exists(stored["name"])
+    
+    @classmethod
+    async def commit(cls, stored: Dict[str, Any]) -> bool:
+        """
+        Store a received upload, unless identical content is already stored.
+        Returns True if the content was new. Otherwise the temporary file is
+        kept until `finalize`, so it can restore the object if it is removed
+        in between.
+        """
+        if await cls.backend.exists(stored["name"]):
+            stored["linked"] = True
+            return False
+        await cls.backend.put_file(stored["temp_path"], stored["name"], stored["content_type"])
+        return True
+    
+    @classmethod
+    async def finalize(cls, stored: Dict[str, Any]) -> None:
+        """Drop the temporary file of an upload once its photo is saved or failed."""
+        temp_path = stored["temp_path"]
+        if not os.path.exists(temp_path):
+            return
+        if stored.get("linked") and not await cls.backend.exists(stored["name"]):
+            # The shared object was deleted while this upload linked to it
+            await cls.backend.put_file(temp_path, stored["name"], stored["content_type"])
+        else:
+            os.remove(temp_path)
+    
+    @classmethod
+    @asynccontextmanager
+    async def local_copy(cls, name: str) -> AsyncIterator[str]:
+        """Path of a stored object on this node's disk, downloaded to a temporary file if need be."""
+        path = cls.backend.local_path(name)
+        if path is not None:
+            yield path
+            return
+        handle, temp_path = tempfile.mkstemp(dir=cls.temp_dir)
+        os.close(handle)
+        try:
+            await cls.backend.download(name, temp_path)
+            yield temp_path
+        finally:
+            os.remove(temp_path)
+    
+    @classmethod
+    async def create_variants(cls, key: str, source_path: str) -> Dict[str, Any]:
+        """
+        Generate the resized variants of a stored original, named after its key,
+        and put them in storage. Raises InvalidImageError if the image can't be read.
+        """
+        work_dir = tempfile.mkdtemp(dir=cls.temp_dir)
+        try:
+            try:
+                processed = await process_image(source_path, work_dir, key)
+            except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+                logger.warning(f"Could not process image {key}: {str(e)}")
+                raise InvalidImageError("File is not a valid image")
+            variants = []
+            for variant in processed["variants"]:
+                name = f"variants/{cls.shard(key)}/{variant['filename']}"
+                await cls.backend.put_file(
+                    os.path.join(work_dir, variant["filename"]),
+                    name,
+                    f"image/{variant['format']}"
+                )
+                variants.append(PhotoVariant(
+                    url=cls.url_for(name),
+                    width=variant["width"],
+                    height=variant["height"],
+                    format=variant["format"],
+                    size=variant["size"]
+                ))
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        
+        # The smallest variant in the preferred format serves as the thumbnail
+        thumbnail = min(
+            (v for v in variants if v.format == variant_formats()[0]),
+            key=lambda v: v.width,
+            default=None
+        )
+        return {
+            "width": processed["width"],
+            "height": processed["height"],
+            "dominant_color": processed["dominant_color"],
+            "placeholder": processed["placeholder"],
+            "thumbnail_url": thumbnail.url if thumbnail else None,
+            "variants": variants
+        }
+    
+    @classmethod
+    async def delete_files(cls, urls: List[Optional[str]]) -> None:
+        """Remove the objects behind stored photo and variant URLs."""
+        for url in urls:
+            name = cls.name_for_url(url)
+            if name:
+                await cls.backend.delete(name)
+                logger.info(f"Deleted photo file: {name}")
@@ -1,10 +1,24 @@
+import asyncio
+import csv
+import io
+import json
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import AsyncIterator, List, Optional, Dict, Any
 from bson import ObjectId
 from fastapi import HTTPException, status
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
+from app.core.config import settings
 from app.db.mongodb import get_database
-from app.models.progress import ProgressCreate, ProgressUpdate, Progress
+from app.models.progress import (
+    ProgressCreate, ProgressUpdate, Progress, ProgressBulkItemResult, ProgressBulkResult, ProgressSummary
+)
+from app.models.user import User
 from app.services.event_service import EventService
+from app.services.idempotency_service import IdempotencyService
+from app.services.leaderboard_service import LeaderboardService
+from app.services.registration_service import RegistrationService
+from app.services.rollup_service import RollupService
 from app.services.user_service import UserService
 
 class ProgressService:
@@ -12,37 +26,158 @@ class ProgressService:
     
     collection_name = "progress"
     
+    # Columns of a progress export, in order
+    export_fields = ["_id", "event_id", "user_id", "distance", "time", "notes", "date", "created_at", "updated_at"]
+    export_batch_size = 500
+    
+    idempotency_scope = "progress:create"
+    
     @classmethod
-    async def create_progress(cls, progress: ProgressCreate) -> Progress:
-        """Create a new progress entry."""
-        db = await get_database()
-        
+    async def create_progress(
+        cls,
+        progress: ProgressCreate,
+        user: Optional[User] = None,
+        idempotency_key: Optional[str] = None
+    ) -> Progress:
+        """
+        Create a new progress entry.
+        Pass the already-resolved `user` to skip looking it up again.
+        With an `idempotency_key`, retries of the same request return the
+        originally created entry instead of creating a duplicate. Only the
+        fields the client sent are hashed, so a retry on a later day still
+        matches; the stored response carries the date that was resolved.
+        """
         # Ensure user_id is set
         if not progress.user_id:
             raise HTTPException(status_code=400, detail="User ID is required")
         
+        if not idempotency_key:
+            return await cls._create_progress(progress, user)
+        
+        scope_args = (cls.idempotency_scope, progress.user_id, idempotency_key)
+        stored_response = await IdempotencyService.begin(
+            *scope_args, IdempotencyService.request_hash(progress.dict(exclude_unset=True))
+        )
+        if stored_response is not None:
+            return Progress(**stored_response)
+        
+        try:
+            created_progress = await cls._create_progress(progress, user)
+        except BaseException:
+            await IdempotencyService.release(*scope_args)
+            raise
+        await IdempotencyService.complete(*scope_args, created_progress.model_dump(by_alias=True))
+        return created_progress
+    
+    @classmethod
+    async def _create_progress(cls, progress: ProgressCreate, user: Optional[User] = None) -> Progress:
+        db = await get_database()
+        
         # Get the user to find their Firebase UID
-        user = await UserService.get_user(progress.user_id)
+        if user is None or str(user.id) != progress.user_id:
+            user = await UserService.get_user(progress.user_id)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         
-        # Check if event exists
-        event = await EventService.get_event(progress.event_id)
-        if not event:
-            raise HTTPException(status_code=404, detail="Event not found")
-        
-        # Check if user is registered for the event - comparing Firebase UID
-        # Events store Firebase UIDs as participants, not MongoDB ObjectIDs
-        if user.firebase_uid not in event.participants:
-            raise HTTPException(status_code=400, detail=f"User is not registered for this event. Firebase UID {user.firebase_uid} not found in participants: {event.participants}")
+        # Check if user is registered for the event; a registration implies the event exists
+        if not ObjectId.is_valid(progress.event_id):
+            raise HTTPException(status_code=400, detail="Invalid event ID format")
+        if not await RegistrationService.is_registered(progress.event_id, str(user.id)):
+            if not await EventService.get_event(progress.event_id):
+                raise HTTPException(status_code=404, detail="Event not found")
+            raise HTTPException(status_code=400, detail="User is not registered for this event")
         
         progress_dict = progress.dict()
         progress_dict["created_at"] = datetime.utcnow()
         
         result = await db[cls.collection_name].insert_one(progress_dict)
+        progress_dict["_id"] = result.inserted_id
+        await asyncio.gather(
+            LeaderboardService.record_progress(progress_dict),
+            RollupService.record_progress([progress_dict])
+        )
         
-        created_progress = await db[cls.collection_name].find_one({"_id": result.inserted_id})
-        return Progress(**created_progress)
+        return Progress(**progress_dict)
+    
+    @classmethod
+    async def create_progress_bulk(cls, entries: List[ProgressCreate], user: User) -> ProgressBulkResult:
+        """
+        Create a batch of progress entries for a user.
+        Registration is checked once per distinct event and all valid entries are
+        written with one unordered insert_many; each entry gets its own result.
+        """
+        db = await get_database()
+        if not entries:
+            raise HTTPException(status_code=400, detail="No progress entries provided")
+        if len(entries) > settings.PROGRESS_BULK_MAX_ENTRIES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"At most {settings.PROGRESS_BULK_MAX_ENTRIES} progress entries can be submitted at once"
+            )
+        
+        user_id = str(user.id)
+        event_ids = {entry.event_id for entry in entries if ObjectId.is_valid(entry.event_id)}
+        registered = await RegistrationService.get_registered_event_ids(user.firebase_uid, list(event_ids))
+        
+        # Only look up events on the failure path, to tell missing events from unregistered ones
+        missing = event_ids - registered
+        existing = set()
+        if missing:
+            async for event in db[EventService.collection_name].find(
+                {"_id": {"$in": [ObjectId(event_id) for event_id in missing]}}, {"_id": 1}
+            ):
+                existing.add(str(event["_id"]))
+        
+        results: List[Optional[ProgressBulkItemResult]] = [None] * len(entries)
+        documents = []
+        positions = []
+        created_at = datetime.utcnow()
+        for index, entry in enumerate(entries):
+            if not ObjectId.is_valid(entry.event_id):
+                detail = "Invalid event ID format"
+            elif entry.event_id in registered:
+                progress_dict = entry.dict()
+                progress_dict["user_id"] = user_id
+                progress_dict["created_at"] = created_at
+                progress_dict["_id"] = ObjectId()
+                documents.append(progress_dict)
+                positions.append(index)
+                continue
+            elif entry.event_id in existing:
+                detail = "User is not registered for this event"
+            else:
+                detail = "Event not found"
+            results[index] = ProgressBulkItemResult(index=index, status="error", detail=detail)
+        
+        failed_writes = {}
+        if documents:
+            try:
+                await db[cls.collection_name].insert_many(documents, ordered=False)
+            except BulkWriteError as e:
+                for error in e.details.get("writeErrors", []):
+                    failed_writes[error["index"]] = error.get("errmsg", "Write failed")
+        
+        inserted = []
+        for document_index, (index, document) in enumerate(zip(positions, documents)):
+            if document_index in failed_writes:
+                results[index] = ProgressBulkItemResult(
+                    index=index, status="error", detail=failed_writes[document_index]
+                )
+            else:
+                inserted.append(document)
+                results[index] = ProgressBulkItemResult(index=index, status="created", id=str(document["_id"]))
+        
+        if inserted:
+            await asyncio.gather(
+                LeaderboardService.record_progress_many(inserted),
+                RollupService.record_progress(inserted)
+            )
+        
+        return ProgressBulkResult(
+            created=len(inserted),
+            failed=len(entries) - len(inserted),
+            results=results
+        )
     
     @classmethod
     async def get_progress(cls, progress_id: str) -> Optional[Progress]:
@@ -70,15 +205,21 @@ class ProgressService:
             
         update_data["updated_at"] = datetime.utcnow()
         
-        result = await db[cls.collection_name].update_one(
+        # The previous values are needed to adjust the leaderboard totals
+        previous_progress = await db[cls.collection_name].find_one_and_update(
             {"_id": ObjectId(progress_id)},
-            {"$set": update_data}
+            {"$set": update_data},
+            return_document=ReturnDocument.BEFORE
         )
         
-        if result.modified_count == 0:
+        if not previous_progress:
             return None
             
-        updated_progress = await db[cls.collection_name].find_one({"_id": ObjectId(progress_id)})
+        updated_progress = {**previous_progress, **update_data}
+        await asyncio.gather(
+            LeaderboardService.update_progress(previous_progress, updated_progress),
+            RollupService.update_progress(previous_progress, updated_progress)
+        )
         return Progress(**updated_progress)
     
     @classmethod
@@ -88,8 +229,15 @@ class ProgressService:
         if not ObjectId.is_valid(progress_id):
             raise HTTPException(status_code=400, detail="Invalid progress ID format")
             
-        result = await db[cls.collection_name].delete_one({"_id": ObjectId(progress_id)})
-        return result.deleted_count > 0
+        deleted_progress = await db[cls.collection_name].find_one_and_delete({"_id": ObjectId(progress_id)})
+        if not deleted_progress:
+            return False
+            
+        await asyncio.gather(
+            LeaderboardService.remove_progress(deleted_progress),
+            RollupService.remove_progress(deleted_progress)
+        )
+        return True
     
     @classmethod
     async def get_user_progress(cls, user_id: str, event_id: Optional[str] = None) -> List[Progress]:
@@ -108,6 +256,49 @@ class ProgressService:
             progress_entries.append(Progress(**progress))
         return progress_entries
     
+    @classmethod
+    async def get_progress_summary(cls, user_id: str, event_id: Optional[str] = None) -> List[ProgressSummary]:
+        """
+        Get a user's progress totals per event, with completion against the event targets.
+        Totals come from the running per-(event, user) documents kept for the
+        leaderboard, so no progress history is scanned.
+        """
+        db = await get_database()
+        if event_id and not ObjectId.is_valid(event_id):
+            raise HTTPException(status_code=400, detail="Invalid event ID format")
+            
+        totals = await LeaderboardService.get_user_totals(user_id, event_id)
+        if not totals:
+            return []
+            
+        events = {}
+        async for event in db[EventService.collection_name].find(
+            {"_id": {"$in": [ObjectId(total["event_id"]) for total in totals]}},
+            {"target_distance": 1, "target_time": 1}
+        ):
+            events[str(event["_id"])] = event
+        
+        summaries = []
+        for total in totals:
+            event = events.get(total["event_id"], {})
+            target_distance = event.get("target_distance")
+            target_time = event.get("target_time")
+            # Distance events complete on distance, the rest on time, as they are ranked
+            if target_distance:
+                completion = min(total.get("total_distance", 0) / target_distance, 1.0)
+            elif target_time:
+                completion = min(total.get("total_time", 0) / target_time, 1.0)
+            else:
+                completion = None
+            summaries.append(ProgressSummary(
+                **total,
+                target_distance=target_distance,
+                target_time=target_time,
+                completion=completion,
+                completed=completion == 1.0
+            ))
+        return summaries
+    
     @classmethod
     async def get_event_progress(cls, event_id: str) -> List[Progress]:
         """Get all progress entries for an event."""
@@ -122,46 +313,96 @@ class ProgressService:
         return progress_entries
     
     @classmethod
-    async def get_leaderboard(cls, event_id: str) -> List[Dict[str, Any]]:
-        """Get leaderboard for an event."""
-        db = await get_database()
+    def _export_row(cls, progress: Dict[str, Any]) -> Dict[str, Any]:
+        """Flatten a progress document into JSON/CSV-safe export values."""
+        row = {}
+        for field in cls.export_fields:
+            value = progress.get(field)
+            if isinstance(value, ObjectId):
+                value = str(value)
+            elif isinstance(value, datetime):
+                value = value.isoformat()
+            row[field] = value
+        return row
+    
+    @classmethod
+    def stream_event_progress(
+        cls,
+        event_id: str,
+        export_format: str = "ndjson",
+        batch_size: Optional[int] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream all progress entries for an event as NDJSON lines or CSV rows.
+        Documents are read from the cursor `batch_size` at a time and written out
+        batch by batch, so memory use doesn't grow with the size of the event.
+        """
         if not ObjectId.is_valid(event_id):
             raise HTTPException(status_code=400, detail="Invalid event ID format")
-            
-        # Get event to determine the type (distance or time based)
-        event = await EventService.get_event(event_id)
-        if not event:
-            raise HTTPException(status_code=404, detail="Event not found")
-            
-        # Aggregate progress by user
-        pipeline = [
-            {"$match": {"event_id": event_id}},
-            {"$group": {
-                "_id": "$user_id",
-                "total_distance": {"$sum": "$distance"},
-                "total_time": {"$sum": "$time"},
-                "last_update": {"$max": "$created_at"}
-            }},
-        ]
-        
-        # Sort based on event type
-        if event.target_distance:
-            pipeline.append({"$sort": {"total_distance": -1, "last_update": 1}})
-        else:
-            pipeline.append({"$sort": {"total_time": -1, "last_update": 1}})
-            
-        leaderboard = []
-        cursor = db[cls.collection_name].aggregate(pipeline)
-        rank = 1
-        
-        async for entry in cursor:
-            leaderboard.append({
-                "rank": rank,
-                "user_id": entry["_id"],
-                "total_distance": entry.get("total_distance", 0),
-                "total_time": entry.get("total_time", 0),
-                "last_update": entry["last_update"]
-            })
-            rank += 1
-            
-        return leaderboard 
\ No newline at end of file
+        if export_format not in ("ndjson", "csv"):
+            raise HTTPException(status_code=400, detail=f"Unsupported export format: {export_format}")
+        
+        return cls._stream_event_progress(event_id, export_format, batch_size or cls.export_batch_size)
+    
+    @classmethod
+    async def _stream_event_progress(cls, event_id: str, export_format: str, batch_size: int) -> AsyncIterator[str]:
+        db = await get_database()
+        buffer = io.StringIO()
+        writer = None
+        if export_format == "csv":
+            writer = csv.DictWriter(buffer, fieldnames=cls.export_fields)
+            writer.writeheader()
+            # Send the header straight away so the client sees the first byte immediately
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        
+        cursor = db[cls.collection_name].find(
+            {"event_id": event_id},
+            {field: 1 for field in cls.export_fields}
+        ).batch_size(batch_size)
+        
+        rows = 0
+        async for progress in cursor:
+            row = cls._export_row(progress)
+            if writer:
+                writer.writerow(row)
+            else:
+                buffer.write(json.dumps(row))
+                buffer.write("\n")
+            rows += 1
+            if rows % batch_size == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        
+        if buffer.tell():
+            yield buffer.getvalue()
+    
+    @classmethod
+    async def get_event_timeseries(
+        cls,
+        event_id: str,
+        bucket: str = "day",
+        user_id: Optional[str] = None,
+        start: Optional[str] = None,
+        end: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Get an event's progress per day or week from the rollups, optionally for one user."""
+        return await RollupService.get_timeseries(event_id, bucket, user_id, start, end)
+    
+    @classmethod
+    async def get_leaderboard(
+        cls,
+        event_id: str,
+        limit: int = 0,
+        after_rank: int = 0,
+        after_user_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Get leaderboard for an event, optionally a window of `limit` entries after a given entry."""
+        return await LeaderboardService.get_leaderboard(event_id, limit, after_rank, after_user_id)
+    
+    @classmethod
+    async def get_user_leaderboard_position(cls, event_id: str, user_id: str, neighbours: int = 5) -> Dict[str, Any]:
+        """Get a user's leaderboard rank and the entries around it."""
+        return await LeaderboardService.get_user_window(event_id, user_id, neighbours)
\ No newline at end of file
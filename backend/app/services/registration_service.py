@@ -0,0 +1,159 @@
+import asyncio
+from datetime import datetime
+from typing import Dict, Any, List, Set, Union
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo.errors import DuplicateKeyError
+from app.db.mongodb import get_database
+from app.models.event import Event, EventSummary
+from app.models.user import User
+from app.services.user_service import UserService
+
+class RegistrationService:
+    """
+    Service for event registration.
+    Each registration is a document keyed by (event_id, user_id) in its own
+    collection; events only carry a denormalized participant_count.
+    """
+    
+    collection_name = "registrations"
+    events_collection_name = "events"
+    
+    @classmethod
+    async def register(cls, event_id: str, user: User) -> Dict[str, Any]:
+        """Register a user for an event."""
+        db = await get_database()
+        if not ObjectId.is_valid(event_id):
+            raise HTTPException(status_code=400, detail="Invalid event ID format")
+            
+        user_id = str(user.id)
+        registration = {
+            "event_id": event_id,
+            "user_id": user_id,
+            "firebase_uid": user.firebase_uid,
+            "created_at": datetime.utcnow()
+        }
+        try:
+            # The unique (event_id, user_id) index rejects duplicate registrations
+            await db[cls.collection_name].insert_one(registration)
+        except DuplicateKeyError:
+            raise HTTPException(status_code=400, detail="User already registered for this event")
+            
+        event_result, _ = await asyncio.gather(
+            db[cls.events_collection_name].update_one(
+                {"_id": ObjectId(event_id)},
+                {"$inc": {"participant_count": 1}}
+            ),
+            db[UserService.collection_name].update_one(
+                {"_id": ObjectId(user_id)},
+                {"$addToSet": {"registered_events": event_id}}
+            )
+        )
+        UserService.invalidate_user_cache(user.firebase_uid)
+        
+        if event_result.matched_count == 0:
+            # Undo the registration for an event that doesn't exist
+            await asyncio.gather(
+                db[cls.collection_name].delete_one({"_id": registration["_id"]}),
+                db[UserService.collection_name].update_one(
+                    {"_id": ObjectId(user_id)},
+                    {"$pull": {"registered_events": event_id}}
+                )
+            )
+            raise HTTPException(status_code=404, detail="Event not found")
+            
+        return {"message": "Successfully registered for event", "event_id": event_id, "registered": True}
+    
+    @classmethod
+    async def unregister(cls, event_id: str, user: User) -> Dict[str, Any]:
+        """Unregister a user from an event."""
+        db = await get_database()
+        if not ObjectId.is_valid(event_id):
+            raise HTTPException(status_code=400, detail="Invalid event ID format")
+            
+        user_id = str(user.id)
+        result = await db[cls.collection_name].delete_one({"event_id": event_id, "user_id": user_id})
+        if result.deleted_count == 0:
+            event = await db[cls.events_collection_name].find_one({"_id": ObjectId(event_id)}, {"_id": 1})
+            if not event:
+                raise HTTPException(status_code=404, detail="Event not found")
+            raise HTTPException(status_code=400, detail="Not registered for this event")
+            
+        await asyncio.gather(
+            db[cls.events_collection_name].update_one(
+                {"_id": ObjectId(event_id)},
+                {"$inc": {"participant_count": -1}}
+            ),
+            db[UserService.collection_name].update_one(
+                {"_id": ObjectId(user_id)},
+                {"$pull": {"registered_events": event_id}}
+            )
+        )
+        UserService.invalidate_user_cache(user.firebase_uid)
+        
+        return {"message": "Successfully unregistered from event", "event_id": event_id, "registered": False}
+    
+    @classmethod
+    async def is_registered(cls, event_id: str, user_id: str) -> bool:
+        """Check whether a user is registered for an event, with one indexed lookup."""
+        db = await get_database()
+        registration = await db[cls.collection_name].find_one(
+            {"event_id": event_id, "user_id": user_id},
+            {"_id": 1}
+        )
+        return registration is not None
+    
+    @classmethod
+    async def get_registered_event_ids(cls, firebase_uid: str, event_ids: List[str]) -> Set[str]:
+        """Get which of the given events a user (by Firebase UID) is registered for."""
+        db = await get_database()
+        cursor = db[cls.collection_name].find(
+            {"firebase_uid": firebase_uid, "event_id": {"$in": event_ids}},
+            {"event_id": 1, "_id": 0}
+        )
+        return {registration["event_id"] async for registration in cursor}
+    
+    @classmethod
+    async def mark_registered(
+        cls,
+        events: List[Union[Event, EventSummary, Dict[str, Any]]],
+        firebase_uid: str
+    ) -> List[Union[Event, EventSummary, Dict[str, Any]]]:
+        """Set `is_registered` on events (models or plain dicts) for the given user."""
+        if not events:
+            return events
+        if isinstance(events[0], dict):
+            registered = await cls.get_registered_event_ids(firebase_uid, [event["_id"] for event in events])
+            for event in events:
+                event["is_registered"] = event["_id"] in registered
+            return events
+        registered = await cls.get_registered_event_ids(firebase_uid, [event.id for event in events])
+        for event in events:
+            event.is_registered = event.id in registered
+        return events
+    
+    @classmethod
+    async def get_user_events(cls, user_id: str) -> List[Event]:
+        """Get all events a user is registered for."""
+        db = await get_database()
+        cursor = db[cls.collection_name].find({"user_id": user_id}, {"event_id": 1, "_id": 0})
+        event_ids = [ObjectId(registration["event_id"]) async for registration in cursor]
+        if not event_ids:
+            return []
+            
+        events = []
+        async for event in db[cls.events_collection_name].find({"_id": {"$in": event_ids}}):
+            events.append(Event(**event, is_registered=True))
+        return events
+    
+    @classmethod
+    async def delete_event_registrations(cls, event_id: str) -> None:
+        """Remove all registrations for a deleted event."""
+        db = await get_database()
+        await asyncio.gather(
+            db[cls.collection_name].delete_many({"event_id": event_id}),
+            db[UserService.collection_name].update_many(
+                {"registered_events": event_id},
+                {"$pull": {"registered_events": event_id}}
+            )
+        )
@@ -0,0 +1,184 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo import DeleteOne, UpdateOne
+from app.db.mongodb import get_database
+
+logger = logging.getLogger(__name__)
+
+class RollupService:
+    """
+    Service for time-bucketed progress rollups.
+    Daily and weekly buckets are kept per event and per (event, user), and
+    adjusted with $inc on every progress mutation, so trend charts read one
+    document per bucket instead of every progress entry.
+    """
+    
+    collection_name = "progress_rollups"
+    buckets = ("day", "week")
+    # user_id of event-wide buckets; $merge can't match on a null field
+    event_wide = "*"
+    
+    @staticmethod
+    def _periods(date: Optional[str]) -> Optional[Dict[str, str]]:
+        """Map a progress date (YYYY-MM-DD) to the start of its day and week (Monday) buckets."""
+        try:
+            day = datetime.strptime(date, "%Y-%m-%d")
+        except (TypeError, ValueError):
+            return None
+        week = day - timedelta(days=day.weekday())
+        return {"day": day.strftime("%Y-%m-%d"), "week": week.strftime("%Y-%m-%d")}
+    
+    @classmethod
+    def _keys(cls, progress: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Keys of the buckets a progress entry counts towards."""
+        periods = cls._periods(progress.get("date"))
+        if not periods:
+            logger.warning(f"Progress {progress.get('_id')} has no valid date, skipping rollups")
+            return []
+        # One bucket for the whole event and one for the user, per bucket size
+        return [
+            {"event_id": progress["event_id"], "bucket": bucket, "user_id": user_id, "period": period}
+            for bucket, period in periods.items()
+            for user_id in (cls.event_wide, progress["user_id"])
+        ]
+    
+    @classmethod
+    def _operations(cls, progress: Dict[str, Any], sign: int) -> List[UpdateOne]:
+        increments = {
+            "distance": sign * (progress.get("distance") or 0),
+            "time": sign * (progress.get("time") or 0),
+            "entries": sign
+        }
+        return [UpdateOne(key, {"$inc": increments}, upsert=sign > 0) for key in cls._keys(progress)]
+    
+    @classmethod
+    async def _write(cls, operations: List[UpdateOne], decremented: List[Dict[str, Any]]) -> None:
+        if not operations:
+            return
+        db = await get_database()
+        await db[cls.collection_name].bulk_write(operations, ordered=False)
+        if decremented:
+            # Buckets whose last entry was removed or moved away, looked up by their unique key
+            await db[cls.collection_name].bulk_write(
+                [DeleteOne({**key, "entries": {"$lte": 0}}) for key in decremented],
+                ordered=False
+            )
+    
+    @classmethod
+    async def record_progress(cls, progress_entries: List[Dict[str, Any]]) -> None:
+        """Add new progress entries to their buckets."""
+        operations = [op for progress in progress_entries for op in cls._operations(progress, 1)]
+        if operations:
+            db = await get_database()
+            await db[cls.collection_name].bulk_write(operations, ordered=False)
+    
+    @classmethod
+    async def update_progress(cls, before: Dict[str, Any], after: Dict[str, Any]) -> None:
+        """Move a progress entry's contribution from its old values and date to the new ones."""
+        if (
+            before.get("date") == after.get("date")
+            and (before.get("distance") or 0) == (after.get("distance") or 0)
+            and (before.get("time") or 0) == (after.get("time") or 0)
+        ):
+            return
+        await cls._write(
+            cls._operations(before, -1) + cls._operations(after, 1),
+            cls._keys(before)
+        )
+    
+    @classmethod
+    async def remove_progress(cls, progress: Dict[str, Any]) -> None:
+        """Subtract a deleted progress entry from its buckets."""
+        await cls._write(cls._operations(progress, -1), cls._keys(progress))
+    
+    @classmethod
+    async def get_timeseries(
+        cls,
+        event_id: str,
+        bucket: str = "day",
+        user_id: Optional[str] = None,
+        start: Optional[str] = None,
+        end: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Get an event's progress per day or week, oldest first, optionally for one user.
+        `start` and `end` (YYYY-MM-DD) bound the bucket periods, inclusive.
+        """
+        db = await get_database()
+        if not ObjectId.is_valid(event_id):
+            raise HTTPException(status_code=400, detail="Invalid event ID format")
+        if bucket not in cls.buckets:
+            raise HTTPException(status_code=400, detail=f"Unknown bucket: {bucket}")
+            
+        query: Dict[str, Any] = {"event_id": event_id, "bucket": bucket, "user_id": user_id or cls.event_wide}
+        period_range = {}
+        for operator, value in (("$gte", start), ("$lte", end)):
+            if value:
+                if not cls._periods(value):
+                    raise HTTPException(status_code=400, detail="Dates must be in YYYY-MM-DD format")
+                period_range[operator] = value
+        if period_range:
+            query["period"] = period_range
+            
+        cursor = db[cls.collection_name].find(
+            query,
+            {"_id": 0, "period": 1, "distance": 1, "time": 1, "entries": 1}
+        ).sort("period", 1)
+        return await cursor.to_list(length=None)
+    
+    @classmethod
+    async def delete_event(cls, event_id: str) -> None:
+        """Remove an event's rollups."""
+        db = await get_database()
+        await db[cls.collection_name].delete_many({"event_id": event_id})
+    
+    @classmethod
+    async def rebuild(cls, event_id: Optional[str] = None) -> None:
+        """Recompute rollups from the progress collection, for one event or all of them."""
+        db = await get_database()
+        match: Dict[str, Any] = {"event_id": event_id} if event_id else {}
+        
+        await db[cls.collection_name].delete_many(match)
+        day = {"$dateFromString": {"dateString": "$date", "format": "%Y-%m-%d", "onError": None, "onNull": None}}
+        periods = {
+            "day": day,
+            "week": {"$dateTrunc": {"date": day, "unit": "week", "startOfWeek": "monday"}},
+        }
+        for bucket, period in periods.items():
+            for per_user in (False, True):
+                pipeline = [
+                    {"$match": match},
+                    {"$set": {"period": period}},
+                    {"$match": {"period": {"$ne": None}}},
+                    {"$group": {
+                        "_id": {
+                            "event_id": "$event_id",
+                            "user_id": "$user_id" if per_user else {"$literal": cls.event_wide},
+                            "period": {"$dateToString": {"date": "$period", "format": "%Y-%m-%d"}}
+                        },
+                        "distance": {"$sum": "$distance"},
+                        "time": {"$sum": "$time"},
+                        "entries": {"$sum": 1}
+                    }},
+                    {"$project": {
+                        "_id": 0,
+                        "event_id": "$_id.event_id",
+                        "bucket": {"$literal": bucket},
+                        "user_id": "$_id.user_id",
+                        "period": "$_id.period",
+                        "distance": 1,
+                        "time": 1,
+                        "entries": 1
+                    }},
+                    {"$merge": {
+                        "into": cls.collection_name,
+                        "on": ["event_id", "bucket", "user_id", "period"],
+                        "whenMatched": "replace",
+                        "whenNotMatched": "insert"
+                    }},
+                ]
+                async for _ in db["progress"].aggregate(pipeline):
+                    pass
@@ -1,9 +1,13 @@
 from datetime import datetime
 import random
 import string
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from bson import ObjectId
 from fastapi import HTTPException, status
+from pymongo import ReturnDocument
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.pagination import keyset_filter, next_cursor, sort_spec
 from app.db.mongodb import get_database
 from app.models.user import UserCreate, UserUpdate, User
 
@@ -12,19 +16,34 @@ class UserService:
     
     collection_name = "users"
     
+    # Users looked up by Firebase UID, invalidated whenever this worker changes them
+    _firebase_uid_cache = TTLCache(max_size=settings.USER_CACHE_MAX_SIZE, ttl=settings.USER_CACHE_TTL)
+    
+    @classmethod
+    def invalidate_user_cache(cls, firebase_uid: str) -> None:
+        """Drop a user from the Firebase UID cache after changing them outside this service."""
+        cls._firebase_uid_cache.delete(firebase_uid)
+    
+    @classmethod
+    def _invalidate_cached_user(cls, user_doc: Optional[dict]) -> None:
+        """Drop a user document from the Firebase UID cache."""
+        if user_doc and user_doc.get("firebase_uid"):
+            cls.invalidate_user_cache(user_doc["firebase_uid"])
+    
     @classmethod
     async def create_user(cls, user: UserCreate) -> User:
         """Create a new user."""
         db = await get_database()
         
-        # Check if user with this firebase_uid already exists
-        existing_user = await db[cls.collection_name].find_one({"firebase_uid": user.firebase_uid})
-        if existing_user:
-            return User(**existing_user)
+        # Check if a user with this firebase_uid or email already exists, in one query
+        existing_users = await db[cls.collection_name].find(
+            {"$or": [{"firebase_uid": user.firebase_uid}, {"email": user.email}]}
+        ).limit(2).to_list(length=2)
+        for existing_user in existing_users:
+            if existing_user.get("firebase_uid") == user.firebase_uid:
+                return User(**existing_user)
         
-        # Check if user with this email already exists
-        existing_email = await db[cls.collection_name].find_one({"email": user.email})
-        if existing_email:
+        if existing_users:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="User with this email already exists"
@@ -46,8 +65,8 @@ class UserService:
         
         result = await db[cls.collection_name].insert_one(user_dict)
         
-        created_user = await db[cls.collection_name].find_one({"_id": result.inserted_id})
-        return User(**created_user)
+        user_dict["_id"] = result.inserted_id
+        return User(**user_dict)
     
     @classmethod
     async def _generate_unique_bib_number(cls) -> str:
@@ -93,10 +112,16 @@ class UserService:
     @classmethod
     async def get_user_by_firebase_uid(cls, firebase_uid: str) -> Optional[User]:
         """Get a user by Firebase UID."""
+        cached_user = cls._firebase_uid_cache.get(firebase_uid)
+        if cached_user is not None:
+            return cached_user
+        
         db = await get_database()
         user = await db[cls.collection_name].find_one({"firebase_uid": firebase_uid})
         if user:
-            return User(**user)
+            user = User(**user)
+            cls._firebase_uid_cache.set(firebase_uid, user)
+            return user
         return None
     
     @classmethod
@@ -113,22 +138,30 @@ class UserService:
             
         update_data["updated_at"] = datetime.utcnow()
         
-        # Update full_name if first_name or last_name is updated
-        user = await cls.get_user(user_id)
-        if user and ("first_name" in update_data or "last_name" in update_data):
-            first_name = update_data.get("first_name", user.first_name)
-            last_name = update_data.get("last_name", user.last_name)
-            update_data["full_name"] = f"{first_name} {last_name}"
+        if "first_name" in update_data or "last_name" in update_data:
+            # Rebuild full_name on the server from the new and stored names, so the
+            # current document doesn't have to be read first. Values are wrapped in
+            # $literal so input starting with "$" isn't taken as a field path.
+            new_fields = {k: {"$literal": v} for k, v in update_data.items()}
+            new_fields["full_name"] = {"$concat": [
+                new_fields.get("first_name", {"$ifNull": ["$first_name", ""]}),
+                " ",
+                new_fields.get("last_name", {"$ifNull": ["$last_name", ""]}),
+            ]}
+            update = [{"$set": new_fields}]
+        else:
+            update = {"$set": update_data}
         
-        result = await db[cls.collection_name].update_one(
+        updated_user = await db[cls.collection_name].find_one_and_update(
             {"_id": ObjectId(user_id)},
-            {"$set": update_data}
+            update,
+            return_document=ReturnDocument.AFTER
         )
         
-        if result.modified_count == 0:
+        if not updated_user:
             return None
             
-        updated_user = await db[cls.collection_name].find_one({"_id": ObjectId(user_id)})
+        cls._invalidate_cached_user(updated_user)
         return User(**updated_user)
     
     @classmethod
@@ -138,57 +171,28 @@ class UserService:
         if not ObjectId.is_valid(user_id):
             raise HTTPException(status_code=400, detail="Invalid user ID format")
             
-        result = await db[cls.collection_name].delete_one({"_id": ObjectId(user_id)})
-        return result.deleted_count > 0
-    
-    @classmethod
-    async def add_event_to_user(cls, user_id: str, event_id: str) -> Optional[User]:
-        """Add an event to a user's registered events."""
-        db = await get_database()
-        if not ObjectId.is_valid(user_id):
-            raise HTTPException(status_code=400, detail="Invalid user ID format")
-            
-        if not ObjectId.is_valid(event_id):
-            raise HTTPException(status_code=400, detail="Invalid event ID format")
-            
-        result = await db[cls.collection_name].update_one(
-            {"_id": ObjectId(user_id)},
-            {"$addToSet": {"registered_events": event_id}}
-        )
-        
-        if result.modified_count == 0:
-            return None
-            
-        updated_user = await db[cls.collection_name].find_one({"_id": ObjectId(user_id)})
-        return User(**updated_user)
-    
-    @classmethod
-    async def remove_event_from_user(cls, user_id: str, event_id: str) -> Optional[User]:
-        """Remove an event from a user's registered events."""
-        db = await get_database()
-        if not ObjectId.is_valid(user_id):
-            raise HTTPException(status_code=400, detail="Invalid user ID format")
-            
-        if not ObjectId.is_valid(event_id):
-            raise HTTPException(status_code=400, detail="Invalid event ID format")
-            
-        result = await db[cls.collection_name].update_one(
+        deleted_user = await db[cls.collection_name].find_one_and_delete(
             {"_id": ObjectId(user_id)},
-            {"$pull": {"registered_events": event_id}}
+            projection={"firebase_uid": 1}
         )
-        
-        if result.modified_count == 0:
-            return None
-            
-        updated_user = await db[cls.collection_name].find_one({"_id": ObjectId(user_id)})
-        return User(**updated_user)
+        cls._invalidate_cached_user(deleted_user)
+        return deleted_user is not None
     
     @classmethod
-    async def get_all_users(cls, skip: int = 0, limit: int = 100) -> List[User]:
-        """Get all users with pagination."""
+    async def get_all_users(
+        cls,
+        skip: int = 0,
+        limit: int = 100,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[User], Optional[str]]:
+        """
+        Get all users with pagination, oldest first, and the cursor for the next page.
+        Pass the `cursor` of the previous page for keyset paging; `skip` is then ignored.
+        """
         db = await get_database()
-        users = []
-        cursor = db[cls.collection_name].find().skip(skip).limit(limit)
-        async for user in cursor:
-            users.append(User(**user))
-        return users 
\ No newline at end of file
+        query = keyset_filter(cursor, "created_at", 1) if cursor else {}
+        results = db[cls.collection_name].find(query).sort(sort_spec("created_at", 1))
+        if skip and not cursor:
+            results = results.skip(skip)
+        docs = await results.limit(limit).to_list(length=limit)
+        return [User(**user) for user in docs], next_cursor(docs, limit, "created_at") 
\ No newline at end of file
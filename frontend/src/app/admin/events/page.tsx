@@ -24,7 +24,8 @@ interface Event {
   end_date: string;
   target_distance?: number;
   target_time?: number;
-  participants: string[];
+  participant_count: number;
+  is_registered?: boolean;
   created_at: string;
 }
 
@@ -108,7 +109,7 @@ export default function AdminEventsPage() {
                   <CardTitle>{event.name}</CardTitle>
                   <CardDescription>
                     Type: {event.event_type} | Participants:{" "}
-                    {event.participants.length}
+                    {event.participant_count}
                   </CardDescription>
                 </div>
                 <div className="flex gap-2">
@@ -39,7 +39,8 @@ interface Event {
   end_date: string;
   target_distance?: number;
   target_time?: number;
-  participants: string[];
+  participant_count: number;
+  is_registered?: boolean;
 }
 
 interface ProgressUpdate {
@@ -157,7 +158,7 @@ export default function EventDetail({ params }: { params: { id: string } }) {
   };
 
   const isRegistered = () => {
-    return user && event && event.participants.includes(user.uid);
+    return user && event && event.is_registered;
   };
 
   const isPastEvent = () => {
@@ -312,7 +313,7 @@ export default function EventDetail({ params }: { params: { id: string } }) {
                   </div>
                 )}
                 <div>
-                  <strong>Participants:</strong> {event.participants?.length || 0}
+                  <strong>Participants:</strong> {event.participant_count || 0}
                 </div>
               </div>
             </CardContent>
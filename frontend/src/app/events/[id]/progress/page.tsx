@@ -28,7 +28,8 @@ interface Event {
   end_date: string;
   target_distance?: number;
   target_time?: number;
-  participants: string[];
+  participant_count: number;
+  is_registered?: boolean;
 }
 
 interface Progress {
@@ -77,7 +78,7 @@ export default function ProgressUpdatePage() {
         setEvent(eventResponse.data);
         
         // Check if user is registered for this event
-        if (!eventResponse.data.participants.includes(user.uid)) {
+        if (!eventResponse.data.is_registered) {
           toast({
             title: "Not Registered",
             description: "You are not registered for this event.",
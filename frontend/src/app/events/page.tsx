@@ -34,7 +34,8 @@ interface Event {
   end_date: string;
   target_distance?: number;
   target_time?: number;
-  participants: string[];
+  participant_count: number;
+  is_registered?: boolean;
 }
 
 export default function EventsPage() {
@@ -132,7 +133,7 @@ export default function EventsPage() {
   };
 
   const isRegistered = (event: Event) => {
-    return user && event.participants.includes(user.uid);
+    return user && event.is_registered;
   };
 
   const formatDate = (dateString: string) => {
@@ -16,13 +16,14 @@ import { auth } from "@/lib/firebase";
 interface Photo {
   _id: string;
   title: string;
-  description: string;
-  image_url: string;
+  description?: string;
   photo_date: string;
-  created_at: string;
-  created_by: string;
-  // Frontend computed properties
-  photo_url?: string;
+  // Known before any image loads, to lay out and paint the grid
+  width?: number;
+  height?: number;
+  dominant_color?: string;
+  placeholder?: string;
+  photo_url: string;
   thumbnail_url?: string;
 }
 
@@ -32,7 +33,7 @@ export default function MemoriesPage() {
   const [photos, setPhotos] = useState<Photo[]>([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
-  const [page, setPage] = useState(1);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [hasMore, setHasMore] = useState(true);
   const [selectedPhoto, setSelectedPhoto] = useState<Photo | null>(null);
   const [isDeleting, setIsDeleting] = useState(false);
@@ -42,49 +43,28 @@ export default function MemoriesPage() {
     threshold: 0,
   });
 
-  // Fetch photos when page changes or component mounts
-  const fetchPhotos = useCallback(async (pageNumber: number) => {
+  // Fetch a page of the gallery; no cursor means the first page
+  const fetchPhotos = useCallback(async (cursor: string | null) => {
     try {
-      const skip = (pageNumber - 1) * 12;
-      const response = await api.get(`/photos/?skip=${skip}&limit=12`);
+      setLoading(true);
+      const params = new URLSearchParams({ limit: "12" });
+      if (cursor) {
+        params.set("cursor", cursor);
+      }
+      const response = await api.get(`/photos/gallery?${params.toString()}`);
       
       if (response.data && Array.isArray(response.data.items)) {
-        // Process photos to ensure they have proper URLs
-        const processedPhotos = response.data.items.map((photo: Photo) => {
-          // Make sure all image URLs are absolute
-          const apiBaseUrl = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:5005';
-          
-          // Handle the case where image_url might already be a complete URL
-          if (!photo.image_url.startsWith('http')) {
-            photo.image_url = `${apiBaseUrl}${photo.image_url}`;
-          }
-          
-          // Set photo_url if not provided or convert to absolute URL
-          if (!photo.photo_url) {
-            photo.photo_url = photo.image_url;
-          } else if (!photo.photo_url.startsWith('http')) {
-            photo.photo_url = `${apiBaseUrl}${photo.photo_url}`;
-          }
-          
-          // Set thumbnail_url if not provided
-          if (!photo.thumbnail_url) {
-            photo.thumbnail_url = photo.photo_url;
-          } else if (!photo.thumbnail_url.startsWith('http')) {
-            photo.thumbnail_url = `${apiBaseUrl}${photo.thumbnail_url}`;
-          }
-          
-          return photo;
-        });
+        const items: Photo[] = response.data.items;
         
         // If it's the first page, replace photos; otherwise append
-        if (pageNumber === 1) {
-          setPhotos(processedPhotos);
+        if (!cursor) {
+          setPhotos(items);
         } else {
-          setPhotos(prev => [...prev, ...processedPhotos]);
+          setPhotos(prev => [...prev, ...items]);
         }
         
-        // Check if we have more photos to load
-        setHasMore(response.data.total > (skip + processedPhotos.length));
+        setNextCursor(response.data.next_cursor);
+        setHasMore(Boolean(response.data.next_cursor));
       } else {
         console.error("Invalid response format:", response.data);
         setError("Failed to load photos. Invalid response format.");
@@ -104,18 +84,14 @@ export default function MemoriesPage() {
 
   // Load more photos when the sentinel comes into view
   useEffect(() => {
-    if (inView && hasMore && !loading) {
-      setPage(prevPage => {
-        const nextPage = prevPage + 1;
-        fetchPhotos(nextPage);
-        return nextPage;
-      });
+    if (inView && hasMore && !loading && nextCursor) {
+      fetchPhotos(nextCursor);
     }
-  }, [inView, hasMore, loading, fetchPhotos]);
+  }, [inView, hasMore, loading, nextCursor, fetchPhotos]);
 
   // Initial load
   useEffect(() => {
-    fetchPhotos(1);
+    fetchPhotos(null);
   }, [fetchPhotos]);
 
   // Add a function to handle photo deletion
@@ -237,20 +213,29 @@ export default function MemoriesPage() {
         </div>
       ) : (
         <>
-          <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 xl:grid-cols-4 gap-6">
+          <div className="columns-1 md:columns-2 lg:columns-3 xl:columns-4 gap-6">
             {photos.map((photo) => (
               <div 
                 key={photo._id} 
-                className="rounded-lg overflow-hidden border bg-card shadow-sm hover:shadow-md transition-shadow duration-200 cursor-pointer"
+                className="mb-6 break-inside-avoid rounded-lg overflow-hidden border bg-card shadow-sm hover:shadow-md transition-shadow duration-200 cursor-pointer"
                 onClick={() => setSelectedPhoto(photo)}
               >
-                <div className="aspect-square relative">
+                {/* Sized and coloured from the gallery data, so the grid doesn't shift as images arrive */}
+                <div
+                  className="relative"
+                  style={{
+                    aspectRatio: photo.width && photo.height ? `${photo.width} / ${photo.height}` : "1 / 1",
+                    backgroundColor: photo.dominant_color,
+                  }}
+                >
                   <Image
-                    src={photo.thumbnail_url || photo.photo_url || photo.image_url || '/placeholder.jpg'}
+                    src={photo.thumbnail_url || photo.photo_url || '/placeholder.jpg'}
                     alt={photo.title}
                     fill
-                    sizes="(max-width: 768px) 100vw, (max-width: 1200px) 50vw, 33vw"
+                    sizes="(max-width: 768px) 100vw, (max-width: 1200px) 50vw, 25vw"
                     className="object-cover"
+                    placeholder={photo.placeholder ? "blur" : "empty"}
+                    blurDataURL={photo.placeholder}
                   />
                 </div>
                 <div className="p-3">
@@ -290,7 +275,7 @@ export default function MemoriesPage() {
           >
             <div className="relative h-[60vh]">
               <Image
-                src={selectedPhoto.photo_url || selectedPhoto.image_url || '/placeholder.jpg'}
+                src={selectedPhoto.photo_url || '/placeholder.jpg'}
                 alt={selectedPhoto.title}
                 fill
                 sizes="(max-width: 768px) 100vw, (max-width: 1200px) 80vw, 70vw"
@@ -26,7 +26,8 @@ interface Event {
   end_date: string;
   target_distance?: number;
   target_time?: number;
-  participants: string[];
+  participant_count: number;
+  is_registered?: boolean;
 }
 
 interface Progress {
@@ -63,14 +64,11 @@ export default function MyEventsPage() {
 
     const fetchUserEvents = async () => {
       try {
-        const response = await api.get("/events");
+        const response = await api.get("/events/user/registered");
         console.log("API Response:", response.data); // Debug log
         
         if (Array.isArray(response.data)) {
-          // Filter events where the user is a participant
-          const userEvents = response.data.filter(
-            (event) => event.participants.includes(user.uid)
-          );
+          const userEvents = response.data;
           setEvents(userEvents);
           
           // Fetch progress for each event